@@ -1,17 +1,41 @@
 # -*- coding: utf-8 -*-
 
+import time
+import socket
 import logging
+import threading
+from collections import deque
+from Queue import Queue
+from Queue import Empty
 from functools import wraps
 from urllib2 import URLError
+from httplib import HTTPException
 
 from noseapp.core import ExtensionInstaller
-from noseapp.utils.common import waiting_for
+from noseapp.utils.common import TimeoutException
 from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 
 from noseapp_selenium import drivers
+from noseapp_selenium import metrics
+from noseapp_selenium.tools import Backoff
+from noseapp_selenium.pool import get_pool
+from noseapp_selenium.hubs import get_balancer
+from noseapp_selenium.cache import ElementCache
+from noseapp_selenium.state import SessionState
+from noseapp_selenium.state import NAVIGATION_COMMANDS
+from noseapp_selenium.diagnostics import DEFAULT_RECORDER_SIZE
 from noseapp_selenium.proxy import to_proxy_object
+from noseapp_selenium.diagnostics import redact_arguments
+from noseapp_selenium.pool import DEFAULT_POOL_SIZE
+from noseapp_selenium.prefetch import get_prefetcher
+from noseapp_selenium.hubs import DEFAULT_HUB_COOLDOWN
+from noseapp_selenium.hubs import DEFAULT_HUB_STRATEGY
 from noseapp_selenium.page_object.router import PageRouter
+from noseapp_selenium.pool import DEFAULT_POOL_IDLE_TIMEOUT
+from noseapp_selenium.connection import is_pooled_url
+from noseapp_selenium.connection import PooledRemoteConnection
+from noseapp_selenium.connection import DEFAULT_CONNECTION_POOL_SIZE
 
 
 logger = logging.getLogger(__name__)
@@ -19,12 +43,34 @@ logger = logging.getLogger(__name__)
 
 GET_DRIVER_SLEEP = 0.5
 GET_DRIVER_TIMEOUT = 10
+GET_DRIVER_ATTEMPTS = 10
+GET_DRIVER_MAX_SLEEP = 5
+
+GET_DRIVER_ERRORS = (
+    URLError,
+    socket.error,
+    HTTPException,
+    WebDriverException,
+)
+
+# parts of messages of errors which will not be fixed by retry
+FATAL_DRIVER_ERRORS = (
+    'executable needs to be in path',
+    'cannot find : capabilities',
+    'cannot find chrome binary',
+    'cannot find firefox binary',
+    'unable to find a matching set of capabilities',
+    'unrecognized capability',
+    'unknown capability',
+    'no such file or directory',
+)
 
 DEFAULT_WINDOW_SIZE = None
 DEFAULT_IMPLICITLY_WAIT = 30
 DEFAULT_POLLING_TIMEOUT = 30
 DEFAULT_MAXIMIZE_WINDOW = True
 DEFAULT_DRIVER = drivers.CHROME
+DEFAULT_COMMAND_EXECUTOR = 'http://127.0.0.1:4444/wd/hub'
 
 DRIVER_TO_CAPABILITIES = {
     drivers.OPERA: DesiredCapabilities.OPERA,
@@ -39,6 +85,20 @@ class SeleniumExError(BaseException):
     pass
 
 
+def is_fatal_error(e):
+    """
+    Check that error of getting driver will not be fixed by retry.
+    Connection errors and full hub are retryable,
+    bad capabilities and missing binary are fatal.
+    """
+    if isinstance(e, (URLError, socket.error, HTTPException)):
+        return False
+
+    message = (getattr(e, 'msg', None) or str(e)).lower()
+
+    return any(error in message for error in FATAL_DRIVER_ERRORS)
+
+
 def get_capabilities(driver_name):
     """
     Get capabilities of driver
@@ -71,6 +131,22 @@ def patch(f):
     return wrapper
 
 
+class DriverStartup(object):
+    """
+    Statistic of getting driver
+    """
+
+    def __init__(self, attempts, wait_time, duration):
+        self.attempts = attempts
+        self.wait_time = wait_time
+        self.duration = duration
+
+    def __repr__(self):
+        return '<DriverStartup attempts={} wait_time={:.3f} duration={:.3f}>'.format(
+            self.attempts, self.wait_time, self.duration,
+        )
+
+
 class DriverConfig(object):
     """
     Configuration for WerDriver instance
@@ -83,23 +159,42 @@ class DriverConfig(object):
         """
         self.__driver = driver
 
+        self.state = SessionState(driver)
+        self.startup = None
+        self.commands = 0
+        self.created = time.time()
+
         self.WINDOW_SIZE = ex.window_size
         self.IMPLICITLY_WAIT = ex.implicitly_wait
         self.MAXIMIZE_WINDOW = ex.maximize_window
         self.POLLING_TIMEOUT = ex.polling_timeout
+        self.ELEMENT_CACHE = ex.element_cache
+        self.ASYNC_WAIT = ex.async_wait
+        self.RECORDER_SIZE = ex.recorder_size
+
+        self.element_cache = ElementCache() if self.ELEMENT_CACHE else None
+        # last commands of session for diagnostics
+        self.recorder = deque(maxlen=self.RECORDER_SIZE) if self.RECORDER_SIZE else None
 
     def apply(self):
         self.apply_implicitly_wait()
+        self.state.sync_implicitly_wait()
         self.apply_window_settings()
 
     def apply_implicitly_wait(self):
+        """
+        Implicit wait will be sent before next search of element
+        """
         if self.IMPLICITLY_WAIT is not None:
-            self.__driver.implicitly_wait(self.IMPLICITLY_WAIT)
+            self.state.require_implicitly_wait(self.IMPLICITLY_WAIT)
         else:
             self.__driver.IMPLICITLY_WAIT = 0
 
     def implicitly_wait(self, value):
-        self.__driver.implicitly_wait(value)
+        """
+        Implicit wait will be sent before next search of element
+        """
+        self.state.require_implicitly_wait(value)
 
     def apply_window_settings(self):
         if self.WINDOW_SIZE:
@@ -107,6 +202,36 @@ class DriverConfig(object):
         elif self.MAXIMIZE_WINDOW:
             self.__driver.maximize_window()
 
+    def record(self, command, args):
+        """
+        Count command and remember it in recorder.
+        Typed text is not remembered.
+        """
+        self.commands += 1
+
+        if self.recorder is not None:
+            self.recorder.append((time.time(), command, redact_arguments(command, args)))
+
+    def clear_element_cache(self):
+        if self.element_cache is not None:
+            self.element_cache.clear()
+
+    def track(self, command, args, kwargs):
+        """
+        Remember state of session after command
+        """
+        self.state.track(command, args, kwargs)
+
+        if command in NAVIGATION_COMMANDS:
+            self.clear_element_cache()
+
+    def invalidate(self):
+        """
+        Forget window, frame and found elements
+        """
+        self.state.invalidate()
+        self.clear_element_cache()
+
 
 class SeleniumEx(object):
     """
@@ -124,17 +249,45 @@ class SeleniumEx(object):
             window_size=DEFAULT_WINDOW_SIZE,
             maximize_window=DEFAULT_MAXIMIZE_WINDOW,
             implicitly_wait=DEFAULT_IMPLICITLY_WAIT,
-            polling_timeout=DEFAULT_POLLING_TIMEOUT):
+            polling_timeout=DEFAULT_POLLING_TIMEOUT,
+            element_cache=False,
+            async_wait=False,
+            recorder_size=DEFAULT_RECORDER_SIZE,
+            use_pool=False,
+            pool_size=DEFAULT_POOL_SIZE,
+            pool_idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT,
+            recycle_policy=None,
+            prefetch=0,
+            metrics_json_path=None,
+            metrics_prometheus_path=None):
         # self settings
         self.__config = config
         self.__use_remote = use_remote
         self.__driver_name = driver_name.lower()
 
+        # pool of sessions
+        self.__use_pool = use_pool
+        self.__pool_size = pool_size
+        self.__pool_idle_timeout = pool_idle_timeout
+        self.__recycle_policy = recycle_policy
+
+        # count of sessions starting in background
+        self.__prefetch = prefetch
+
+        if metrics_json_path or metrics_prometheus_path:
+            metrics.enable(
+                json_path=metrics_json_path,
+                prometheus_path=metrics_prometheus_path,
+            )
+
         # will be pushed to web driver config
         self.__window_size = window_size
         self.__maximize_window = maximize_window
         self.__implicitly_wait = implicitly_wait
         self.__polling_timeout = polling_timeout
+        self.__element_cache = element_cache
+        self.__async_wait = async_wait
+        self.__recorder_size = recorder_size
 
         logger.debug(
             'Selenium-EX initialize. Config: {}, Use Remote: {}, Driver name: {}'.format(
@@ -144,6 +297,10 @@ class SeleniumEx(object):
             ),
         )
 
+        # sessions are starting while tests are prepared
+        if self.__prefetch:
+            self.prefetcher.fill()
+
     @classmethod
     def install(cls, app, url_rule_to_page=None):
         """
@@ -192,6 +349,67 @@ class SeleniumEx(object):
     def polling_timeout(self):
         return self.__polling_timeout
 
+    @property
+    def element_cache(self):
+        return self.__element_cache
+
+    @property
+    def async_wait(self):
+        return self.__async_wait
+
+    @property
+    def recorder_size(self):
+        return self.__recorder_size
+
+    @property
+    def use_pool(self):
+        return self.__use_pool
+
+    @property
+    def session_key(self):
+        """
+        Sessions with equal key are interchangeable
+        """
+        return (
+            id(self.__config),
+            self.__use_remote,
+            self.__driver_name,
+            self.__window_size,
+            self.__maximize_window,
+            self.__implicitly_wait,
+            self.__polling_timeout,
+            self.__element_cache,
+            self.__async_wait,
+            self.__recorder_size,
+        )
+
+    @property
+    def pool(self):
+        """
+        Pool of sessions for current settings
+        """
+        return get_pool(
+            self.session_key,
+            size=self.__pool_size,
+            idle_timeout=self.__pool_idle_timeout,
+            recycle_policy=self.__recycle_policy,
+        )
+
+    @property
+    def prefetcher(self):
+        """
+        Prefetcher of sessions for current settings.
+        None if prefetching is disabled.
+        """
+        if not self.__prefetch:
+            return None
+
+        return get_prefetcher(
+            self.session_key,
+            self._create_driver,
+            depth=self.__prefetch,
+        )
+
     @patch
     def remote(self):
         """
@@ -204,16 +422,49 @@ class SeleniumEx(object):
 
         logger.debug('Remote config: {}'.format(str(remote_config)))
 
-        options = remote_config.get('options', {})
+        options = dict(remote_config.get('options', {}))
+        pool_size = options.pop('connection_pool_size', DEFAULT_CONNECTION_POOL_SIZE)
+        hub_strategy = options.pop('hub_strategy', DEFAULT_HUB_STRATEGY)
+        hub_cooldown = options.pop('hub_cooldown', DEFAULT_HUB_COOLDOWN)
+        hub_sticky = options.pop('hub_sticky', True)
+        command_executor = options.get('command_executor', DEFAULT_COMMAND_EXECUTOR)
+
+        balancer = None
+
+        if isinstance(command_executor, (list, tuple)):
+            balancer = get_balancer(
+                command_executor,
+                strategy=hub_strategy,
+                cooldown=hub_cooldown,
+                sticky=hub_sticky,
+            )
+            command_executor = options['command_executor'] = balancer.choose()
+
+        if pool_size and isinstance(command_executor, basestring) and is_pooled_url(command_executor):
+            options['command_executor'] = PooledRemoteConnection(
+                command_executor,
+                pool_size=pool_size,
+            )
+
         capabilities = get_capabilities(self.__driver_name)
         capabilities.update(
             remote_config['capabilities'][self.__driver_name],
         )
 
-        return drivers.RemoteWebDriver(
-            desired_capabilities=capabilities,
-            **options
-        )
+        try:
+            driver = drivers.RemoteWebDriver(
+                desired_capabilities=capabilities,
+                **options
+            )
+        except GET_DRIVER_ERRORS as e:
+            if balancer and not is_fatal_error(e):
+                balancer.eject(command_executor)
+            raise
+
+        if balancer:
+            balancer.bind(driver, command_executor)
+
+        return driver
 
     @patch
     def ie(self):
@@ -292,6 +543,66 @@ class SeleniumEx(object):
             'Incorrect driver name "{}"'.format(self.__driver_name),
         )
 
+    def _create_driver(self, timeout=None, sleep=None, attempts=None):
+        """
+        Create new session.
+        Retry with exponential backoff while error is retryable
+        and budget of time and attempts is not exceeded.
+
+        :param timeout: timeout for getting driver
+        :param sleep: first sleep of backoff
+        :param attempts: max count of attempts
+        """
+        if self.__use_remote:
+            factory = self.remote
+        else:
+            factory = self._get_local_driver
+
+        timeout = timeout or GET_DRIVER_TIMEOUT
+        attempts = attempts or GET_DRIVER_ATTEMPTS
+        backoff = Backoff(
+            base=sleep or GET_DRIVER_SLEEP,
+            max_sleep=GET_DRIVER_MAX_SLEEP,
+        )
+
+        attempt = 0
+        wait_time = 0
+        t_start = time.time()
+
+        while True:
+            attempt += 1
+
+            try:
+                driver = factory()
+            except GET_DRIVER_ERRORS as e:
+                if is_fatal_error(e):
+                    raise
+                error = e
+            else:
+                driver.config.startup = DriverStartup(
+                    attempt, wait_time, time.time() - t_start,
+                )
+                logger.debug('Driver is started: {}'.format(repr(driver.config.startup)))
+                return driver
+
+            sleep = backoff(attempt - 1)
+
+            if attempt >= attempts or time.time() + sleep > t_start + timeout:
+                raise TimeoutException(
+                    'Could not get driver. Attempts: {}, wait time: {:.3f}, last error: {}: {}'.format(
+                        attempt, wait_time, error.__class__.__name__, str(error).strip(),
+                    ),
+                )
+
+            logger.debug(
+                'Could not get driver, retry after {:.3f} sec: {}: {}'.format(
+                    sleep, error.__class__.__name__, str(error).strip(),
+                ),
+            )
+
+            time.sleep(sleep)
+            wait_time += sleep
+
     def get_driver(self,
                    driver_name=None,
                    timeout=None,
@@ -299,30 +610,115 @@ class SeleniumEx(object):
         """
         :param driver_name: name of web driver
         :param timeout: timeout for getting driver
-        :param sleep: sleep for polling
+        :param sleep: first sleep of backoff
+
+        If pool is used then session will be taken from pool
+        and will be returned to pool on quit.
+        If prefetching is enabled then session started
+        in background will be used when it is ready.
 
         :return: selenium.webdriver.remote.webdriver.WebDriver
         """
         if driver_name is not None:
             self.__driver_name = driver_name
 
-        def get_driver(func):
-            try:
-                return func()
-            except (URLError, WebDriverException):
-                return None
+        driver = None
+        prefetcher = self.prefetcher
 
-        if self.__use_remote:
-            driver = waiting_for(
-                lambda: get_driver(self.remote),
-                timeout=timeout or GET_DRIVER_TIMEOUT,
-                sleep=sleep or GET_DRIVER_SLEEP,
-            )
-        else:
-            driver = waiting_for(
-                lambda: get_driver(self._get_local_driver),
-                timeout=timeout or GET_DRIVER_TIMEOUT,
-                sleep=sleep or GET_DRIVER_SLEEP,
-            )
+        if self.__use_pool:
+            driver = self.pool.acquire()
+
+        if driver is None and prefetcher is not None:
+            driver = prefetcher.get()
+
+        if driver is None:
+            driver = self._create_driver(timeout=timeout, sleep=sleep)
+
+        if self.__use_pool:
+            return self.pool.bind(driver)
 
         return driver
+
+    def get_drivers(self,
+                    count,
+                    driver_name=None,
+                    timeout=None,
+                    sleep=None):
+        """
+        Get several sessions. Sessions are starting concurrently.
+        If any session could not be started then all started sessions
+        will be closed and exception will be raised.
+
+        :param count: count of sessions
+        :param driver_name: name of web driver
+        :param timeout: timeout for getting driver
+        :param sleep: first sleep of backoff
+
+        :return: list of selenium.webdriver.remote.webdriver.WebDriver
+        """
+        if driver_name is not None:
+            self.__driver_name = driver_name
+
+        queue = Queue()
+        lock = threading.Lock()
+        failed = threading.Event()
+
+        def close(driver):
+            try:
+                driver.quit()
+            except (URLError, WebDriverException) as e:
+                logger.debug('Error on quit from session: {}'.format(e))
+
+        def start():
+            try:
+                driver = self.get_driver(timeout=timeout, sleep=sleep)
+            except BaseException as e:
+                queue.put((None, e))
+                return
+
+            with lock:
+                if not failed.is_set():
+                    queue.put((driver, None))
+                    return
+
+            close(driver)
+
+        for _ in xrange(count):
+            thread = threading.Thread(target=start, name='noseapp-selenium-get-drivers')
+            thread.daemon = True
+            thread.start()
+
+        result = []
+        error = None
+        t_end = time.time() + (timeout or GET_DRIVER_TIMEOUT) + GET_DRIVER_SLEEP
+
+        while len(result) < count:
+            try:
+                driver, error = queue.get(timeout=max(t_end - time.time(), 0))
+            except Empty:
+                error = TimeoutException(
+                    'Could not get {} sessions. Timeout "{}" exceeded.'.format(
+                        count, timeout or GET_DRIVER_TIMEOUT,
+                    ),
+                )
+
+            if error is not None:
+                break
+
+            result.append(driver)
+
+        if error is not None:
+            with lock:
+                failed.set()
+
+            while not queue.empty():
+                driver, _ = queue.get_nowait()
+
+                if driver is not None:
+                    result.append(driver)
+
+            map(close, result)
+
+            raise error
+
+        return result
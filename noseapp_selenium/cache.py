@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cache of found web elements
+"""
+
+import logging
+from collections import OrderedDict
+
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.common.exceptions import StaleElementReferenceException
+
+from noseapp_selenium.tools import execute_script
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_ELEMENT_CACHE_SIZE = 500
+
+# element is inside document and area of search and matches selector still
+MATCHES_SCRIPT = """
+var element = arguments[0], css = arguments[1];
+var root = arguments.length > 2 ? arguments[2] : document.documentElement;
+var matches = element.matches || element.msMatchesSelector || element.webkitMatchesSelector;
+
+return root.contains(element) && (!matches || matches.call(element, css));
+"""
+
+
+def is_matched(client, element, css):
+    """
+    Cheap check of cached element by one script
+
+    :param client: ProxyObject of web driver or web element
+    :param element: ProxyObject of cached web element
+    :param css: css selector
+    """
+    try:
+        return bool(execute_script(client, MATCHES_SCRIPT, element.orig(), css))
+    except StaleElementReferenceException:
+        return False
+
+
+def get_scope_key(client):
+    """
+    Key of area of search
+
+    :param client: ProxyObject of web driver or web element
+    """
+    wrapped = client.orig()
+
+    if isinstance(wrapped, WebDriver):
+        return None
+
+    return wrapped.id
+
+
+class ElementCache(object):
+    """
+    Storage of web elements by css and area of search.
+    Stale element will be found again by its locator inside polling,
+    so cached element is not checked on getting without check callback.
+    """
+
+    def __init__(self, size=DEFAULT_ELEMENT_CACHE_SIZE):
+        self.__size = size
+        self.__elements = OrderedDict()
+
+    def __len__(self):
+        return len(self.__elements)
+
+    def __repr__(self):
+        return '<ElementCache size={} elements={}>'.format(self.__size, len(self.__elements))
+
+    def get(self, client, css, find, check=None):
+        """
+        Get element from cache or find it
+
+        :param client: ProxyObject of web driver or web element
+        :param css: css selector
+        :param find: callback for search of element
+        :param check: callback for checking of cached element, optional
+        """
+        key = (get_scope_key(client), css)
+
+        try:
+            element = self.__elements.pop(key)
+        except KeyError:
+            element = find()
+        else:
+            if check is not None and not check(element):
+                logger.debug(u'Cached element is changed: {}'.format(css))
+                element = find()
+
+        self.__elements[key] = element
+
+        if len(self.__elements) > self.__size:
+            self.__elements.popitem(last=False)
+
+        return element
+
+    def clear(self):
+        if self.__elements:
+            logger.debug('Element cache is cleared')
+            self.__elements.clear()
@@ -39,7 +39,11 @@ class Config(dict):
 
     def remote_configure(self, options=None, capabilities=None):
         """
-        :param options: kwargs for method of WebDriver class
+        :param options: kwargs for method of WebDriver class,
+          "connection_pool_size" is size of pool of keep-alive
+          connections to hub, use 0 for disable pool,
+          "command_executor" can be list of hubs, then
+          "hub_strategy", "hub_cooldown" and "hub_sticky" are used for balancing
         :param capabilities: update base capabilities
         """
         self['REMOTE_WEBDRIVER']['options'].update(options or {})
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+
+"""
+Command executor with pool of keep-alive connections
+"""
+
+import errno
+import socket
+import httplib
+import threading
+from urlparse import urlparse
+from Queue import LifoQueue
+from Queue import Empty
+from Queue import Full
+
+from selenium.webdriver.remote.remote_connection import RemoteConnection
+
+
+DEFAULT_CONNECTION_POOL_SIZE = 10
+DEFAULT_CONNECTION_POOL_TIMEOUT = 60
+
+CONNECTION_CLASSES = {
+    'http': httplib.HTTPConnection,
+    'https': httplib.HTTPSConnection,
+}
+
+
+class ConnectionPoolError(IOError):
+    pass
+
+
+def is_stale_connection_error(e):
+    """
+    Idle connection was closed by server before request was processed
+    """
+    if isinstance(e, httplib.BadStatusLine):
+        return True
+
+    return isinstance(e, socket.error) and e.errno == errno.EPIPE
+
+
+def is_pooled_url(url):
+    """
+    Connections to url can be taken from pool
+    """
+    return urlparse(url).scheme in CONNECTION_CLASSES
+
+
+class ConnectionPool(object):
+    """
+    Bounded pool of keep-alive connections to one host.
+    Default port of scheme is used if port is None.
+    """
+
+    def __init__(self,
+                 host,
+                 port,
+                 size=DEFAULT_CONNECTION_POOL_SIZE,
+                 timeout=DEFAULT_CONNECTION_POOL_TIMEOUT,
+                 scheme='http'):
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+        self.__connection_class = CONNECTION_CLASSES[scheme]
+
+        self.__queue = LifoQueue(size)
+
+        for _ in xrange(size):
+            self.__queue.put(None)
+
+    def __repr__(self):
+        return '<ConnectionPool {}:{}>'.format(self.__host, self.__port)
+
+    def get(self):
+        """
+        Get free connection.
+        New connection will be created if there is not idle.
+        """
+        try:
+            conn = self.__queue.get(timeout=self.__timeout)
+        except Empty:
+            raise ConnectionPoolError(
+                'Could not get connection to {}:{}. Timeout "{}" exceeded.'.format(
+                    self.__host, self.__port, self.__timeout,
+                ),
+            )
+
+        if conn is None:
+            conn = self.__connection_class(self.__host, self.__port)
+
+        return conn
+
+    def put(self, conn):
+        """
+        Return connection to pool
+        """
+        try:
+            self.__queue.put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def close(self):
+        """
+        Close all idle connections
+        """
+        while True:
+            try:
+                conn = self.__queue.get_nowait()
+            except Empty:
+                break
+
+            if conn is not None:
+                conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(host, port, size=DEFAULT_CONNECTION_POOL_SIZE, scheme='http'):
+    """
+    Get pool of connections by scheme, host and port.
+    One pool will be created for host inside process.
+    """
+    with _pools_lock:
+        key = (scheme, host, port)
+
+        if key not in _pools:
+            _pools[key] = ConnectionPool(host, port, size=size, scheme=scheme)
+
+        return _pools[key]
+
+
+class PooledRemoteConnection(RemoteConnection):
+    """
+    Remote connection which takes keep-alive connection
+    from pool for each command. Can be used from several threads.
+    """
+
+    def __init__(self, remote_server_addr, pool_size=DEFAULT_CONNECTION_POOL_SIZE):
+        self.__local = threading.local()
+
+        super(PooledRemoteConnection, self).__init__(remote_server_addr, keep_alive=True)
+
+        parsed_url = urlparse(remote_server_addr)
+        self.__pool = get_connection_pool(
+            parsed_url.hostname,
+            parsed_url.port,
+            size=pool_size,
+            scheme=parsed_url.scheme,
+        )
+
+    @property
+    def _conn(self):
+        return self.__local.conn
+
+    @_conn.setter
+    def _conn(self, conn):
+        # connection of base class is not used
+        pass
+
+    def _request(self, method, url, body=None):
+        if getattr(self.__local, 'conn', None) is not None:
+            # redirect is followed by nested request inside request,
+            # held connection is used for it, response was read already
+            return super(PooledRemoteConnection, self)._request(method, url, body=body)
+
+        conn = self.__local.conn = self.__pool.get()
+
+        try:
+            # connection which was idle can be closed by server,
+            # so request will be repeated once with new connection
+            # if server did not process it
+            reused = conn.sock is not None
+
+            try:
+                return super(PooledRemoteConnection, self)._request(method, url, body=body)
+            except (socket.error, httplib.HTTPException) as e:
+                conn.close()
+
+                if not reused or not is_stale_connection_error(e):
+                    raise
+
+            return super(PooledRemoteConnection, self)._request(method, url, body=body)
+        except (socket.error, httplib.HTTPException):
+            conn.close()
+            raise
+        finally:
+            self.__local.conn = None
+            self.__pool.put(conn)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""
+Diagnostics of failed commands
+"""
+
+import time
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RECORDER_SIZE = 20
+DEFAULT_EXCERPT_SIZE = 2000
+DEFAULT_ARGUMENT_SIZE = 100
+
+# typed text can contain passwords, it is not recorded
+REDACTED_COMMANDS = frozenset([
+    'send_keys',
+    'send_keys_to_element',
+])
+REDACTED_ARGUMENT = '***'
+
+HTML_EXCERPT_SCRIPT = """
+var html = arguments[0].innerHTML, size = arguments[1];
+
+if (html.length > size) {
+    return html.slice(0, size) + '... (' + html.length + ' chars)';
+}
+
+return html;
+"""
+
+
+def to_text(value):
+    if isinstance(value, unicode):
+        return value
+
+    if isinstance(value, str):
+        return value.decode('utf-8', 'replace')
+
+    return unicode(value)
+
+
+def truncate(text, size):
+    if len(text) > size:
+        return text[:size] + u'...'
+
+    return text
+
+
+def get_html_excerpt(element, size=DEFAULT_EXCERPT_SIZE):
+    """
+    Beginning of inner HTML of element
+
+    :type element: selenium.webdriver.remote.webelement.WebElement
+    """
+    return element.parent.execute_script(HTML_EXCERPT_SCRIPT, element, size)
+
+
+def redact_arguments(command, args):
+    """
+    Hide arguments of command which types text
+    """
+    if command in REDACTED_COMMANDS:
+        return (REDACTED_ARGUMENT, ) if args else ()
+
+    return args
+
+
+def format_commands(recorder):
+    """
+    Format last commands of session
+
+    :param recorder: items of (time, command name, args)
+    """
+    now = time.time()
+
+    return u'\n'.join(
+        u'-{:.3f}s {}({})'.format(
+            now - t,
+            name,
+            u', '.join(truncate(to_text(repr(a)), DEFAULT_ARGUMENT_SIZE) for a in args),
+        )
+        for t, name, args in recorder
+    )
+
+
+class LazyMessage(object):
+    """
+    Message of exception which will be extended on first use only
+    """
+
+    def __init__(self, message, render):
+        """
+        :param message: original message
+        :param render: callback for getting of extension
+        """
+        self.__message = message
+        self.__render = render
+        self.__text = None
+
+    def __unicode__(self):
+        if self.__text is None:
+            try:
+                extension = self.__render()
+            except Exception as e:
+                logger.debug(u'Diagnostics are not available: {}'.format(e))
+                extension = u' (diagnostics are not available: {})'.format(
+                    to_text(e.__class__.__name__),
+                )
+
+            self.__text = to_text(self.__message or u'') + extension
+
+        return self.__text
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __repr__(self):
+        return repr(unicode(self))
+
+    def __len__(self):
+        return len(unicode(self))
+
+    def __getitem__(self, item):
+        return unicode(self)[item]
+
+    def __contains__(self, item):
+        return item in unicode(self)
+
+    def __add__(self, other):
+        return unicode(self) + other
+
+    def __radd__(self, other):
+        return other + unicode(self)
+
+    def __eq__(self, other):
+        return unicode(self) == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(unicode(self))
+
+    def __getattr__(self, item):
+        if item.startswith('_'):
+            raise AttributeError(item)
+
+        return getattr(unicode(self), item)
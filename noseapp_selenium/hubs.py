@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+"""
+Balancing of remote sessions between several hubs
+"""
+
+import json
+import time
+import random
+import socket
+import logging
+import threading
+from urllib2 import urlopen
+from urllib2 import URLError
+from urllib2 import HTTPError
+from httplib import HTTPException
+
+
+logger = logging.getLogger(__name__)
+
+
+CAPACITY = 'capacity'
+LEAST_SESSIONS = 'least_sessions'
+
+DEFAULT_HUB_STRATEGY = LEAST_SESSIONS
+DEFAULT_HUB_COOLDOWN = 60
+DEFAULT_STATUS_TIMEOUT = 2
+# sticky hub is changed when it has more sessions than others by this count
+DEFAULT_HUB_IMBALANCE = 2
+
+# api of Grid 2/3 hub is placed at root of server
+LEGACY_HUB_PATH = '/wd/hub'
+LEGACY_API_PATH = '/grid/api/hub'
+
+
+def get_free_slots(status):
+    """
+    Get count of free slots from response of /status of Grid 4.
+    None if hub does not report it.
+
+    :type status: dict
+    """
+    value = status.get('value')
+
+    if not isinstance(value, dict):
+        return None
+
+    if value.get('ready') is False:
+        return 0
+
+    nodes = value.get('nodes')
+
+    if not isinstance(nodes, list):
+        return None
+
+    return sum(
+        1
+        for node in nodes
+        for slot in node.get('slots', [])
+        if not slot.get('session')
+    )
+
+
+def get_legacy_free_slots(api):
+    """
+    Get count of free slots from response of /grid/api/hub of Grid 3.
+    None if hub does not report it, Grid 2 does not do it.
+
+    :type api: dict
+    """
+    slot_counts = api.get('slotCounts')
+
+    if not isinstance(slot_counts, dict):
+        return None
+
+    return slot_counts.get('free')
+
+
+def get_legacy_api_url(url):
+    url = url.rstrip('/')
+
+    if url.endswith(LEGACY_HUB_PATH):
+        url = url[:-len(LEGACY_HUB_PATH)]
+
+    return url + LEGACY_API_PATH
+
+
+class Hub(object):
+
+    def __init__(self, url):
+        self.url = url
+        self.sessions = 0
+        self.ejected_until = 0
+
+    def __repr__(self):
+        return '<Hub {} sessions={}>'.format(self.url, self.sessions)
+
+    @property
+    def healthy(self):
+        return time.time() >= self.ejected_until
+
+
+class HubBalancer(object):
+    """
+    Choose hub for new session by least count of sessions
+    or by free slots from /status. Hub is sticky inside process
+    while it is healthy, is not saturated and has not much more
+    sessions than other hubs.
+    """
+
+    def __init__(self,
+                 urls,
+                 strategy=DEFAULT_HUB_STRATEGY,
+                 cooldown=DEFAULT_HUB_COOLDOWN,
+                 sticky=True,
+                 imbalance=DEFAULT_HUB_IMBALANCE):
+        """
+        :param urls: urls of hubs
+        :param strategy: LEAST_SESSIONS or CAPACITY
+        :param cooldown: seconds while unhealthy hub will not be used
+        :param sticky: use the same hub while it is possible
+        :param imbalance: difference of sessions for changing of sticky hub
+        """
+        if strategy not in (LEAST_SESSIONS, CAPACITY):
+            raise ValueError('Unknown strategy "{}"'.format(strategy))
+
+        self.__strategy = strategy
+        self.__cooldown = cooldown
+        self.__sticky = sticky
+        self.__imbalance = imbalance
+
+        self.__hubs = dict((url, Hub(url)) for url in urls)
+        self.__current = None
+        self.__lock = threading.Lock()
+
+    def __repr__(self):
+        return '<HubBalancer {}>'.format(self.__hubs.values())
+
+    @property
+    def hubs(self):
+        return self.__hubs.values()
+
+    def probe(self, url):
+        """
+        Get count of free slots of hub.
+        Api of Grid 3 is requested if /status does not report slots.
+        Unavailable hub will be ejected.
+        """
+        try:
+            response = urlopen(
+                '{}/status'.format(url.rstrip('/')),
+                timeout=DEFAULT_STATUS_TIMEOUT,
+            )
+            free_slots = get_free_slots(json.loads(response.read()))
+
+            if free_slots is None:
+                free_slots = self.probe_legacy(url)
+
+            return free_slots
+        except (URLError, socket.error, HTTPException) as e:
+            logger.debug('Hub {} is unavailable: {}'.format(url, e))
+            self.eject(url)
+            return 0
+        except (ValueError, AttributeError):
+            return None
+
+    @staticmethod
+    def probe_legacy(url):
+        """
+        Get count of free slots by api of Grid 3.
+        None if api is not found.
+        """
+        try:
+            response = urlopen(
+                get_legacy_api_url(url),
+                timeout=DEFAULT_STATUS_TIMEOUT,
+            )
+        except HTTPError as e:
+            logger.debug('Api of hub {} is not found: {}'.format(url, e))
+            return None
+
+        return get_legacy_free_slots(json.loads(response.read()))
+
+    def is_balanced(self, hub, hubs):
+        """
+        Hub has not much more sessions than other hubs
+        """
+        return hub.sessions - min(h.sessions for h in hubs) < self.__imbalance
+
+    def choose(self):
+        """
+        Get url of hub for new session
+        """
+        with self.__lock:
+            hubs = [h for h in self.__hubs.values() if h.healthy]
+
+            if not hubs:
+                hubs = sorted(self.__hubs.values(), key=lambda h: h.ejected_until)[:1]
+
+            current = self.__hubs.get(self.__current)
+
+        if self.__sticky and current in hubs and self.is_balanced(current, hubs):
+            if self.__strategy != CAPACITY or self.probe(current.url) != 0:
+                return current.url
+
+        random.shuffle(hubs)
+
+        if self.__strategy == CAPACITY:
+            free_slots = dict((h.url, self.probe(h.url)) for h in hubs)
+            hub = min(
+                hubs,
+                key=lambda h: (
+                    free_slots[h.url] == 0,
+                    -(free_slots[h.url] or 0),
+                    h.sessions,
+                ),
+            )
+        else:
+            hub = min(hubs, key=lambda h: h.sessions)
+
+        with self.__lock:
+            self.__current = hub.url
+
+        logger.debug('Hub {} is chosen'.format(hub.url))
+
+        return hub.url
+
+    def eject(self, url):
+        """
+        Do not use hub while cooldown
+        """
+        logger.debug('Hub {} is ejected for {} sec'.format(url, self.__cooldown))
+
+        with self.__lock:
+            self.__hubs[url].ejected_until = time.time() + self.__cooldown
+
+            if self.__current == url:
+                self.__current = None
+
+    def bind(self, driver, url):
+        """
+        Count session of hub while session is not closed
+
+        :type driver: selenium.webdriver.remote.webdriver.WebDriver
+        """
+        hub = self.__hubs[url]
+
+        with self.__lock:
+            hub.sessions += 1
+
+        quit = driver.quit
+
+        def release():
+            try:
+                quit()
+            finally:
+                with self.__lock:
+                    hub.sessions -= 1
+
+        driver.quit = release
+
+        return driver
+
+
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+
+def get_balancer(urls, **kwargs):
+    """
+    Get balancer by urls of hubs.
+    One balancer will be created for urls inside process.
+    """
+    key = tuple(urls)
+
+    with _balancers_lock:
+        if key not in _balancers:
+            _balancers[key] = HubBalancer(key, **kwargs)
+
+        return _balancers[key]
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+"""
+Latency metrics of web driver commands
+"""
+
+import os
+import json
+import atexit
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+
+logger = logging.getLogger(__name__)
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+PROMETHEUS_PREFIX = 'noseapp_selenium_command'
+
+
+class Histogram(object):
+    """
+    Histogram of command latency with counters of retries and payload
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+        self.retries = 0
+        self.payload = 0
+        self.buckets = [0] * len(BUCKETS)
+
+    def add(self, latency, retries=0, payload=0, error=False):
+        self.count += 1
+        self.sum += latency
+        self.retries += retries
+        self.payload += payload
+        self.errors += int(error)
+
+        index = bisect_left(BUCKETS, latency)
+
+        if index < len(self.buckets):
+            self.buckets[index] += 1
+
+    def to_dict(self):
+        cumulative = 0
+        buckets = {}
+
+        for le, count in zip(BUCKETS, self.buckets):
+            cumulative += count
+            buckets[str(le)] = cumulative
+
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'errors': self.errors,
+            'retries': self.retries,
+            'payload': self.payload,
+            'buckets': buckets,
+        }
+
+
+class Metrics(object):
+    """
+    Storage of histograms by command, by session and by test
+    """
+
+    def __init__(self):
+        self.enabled = False
+
+        self.__test = None
+        self.__commands = {}
+        self.__sessions = {}
+        self.__tests = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def test(self):
+        return self.__test
+
+    def set_test(self, name):
+        """
+        Commands will be counted for test with name.
+        Use None for stop counting for test.
+        """
+        self.__test = name
+
+    @contextmanager
+    def for_test(self, name):
+        previous = self.__test
+        self.set_test(name)
+
+        try:
+            yield
+        finally:
+            self.set_test(previous)
+
+    def record(self, command, latency, session=None, retries=0, payload=0, error=False):
+        """
+        Add result of command to histograms
+        """
+        with self.__lock:
+            storages = [self.__commands]
+
+            if session is not None:
+                storages.append(self.__sessions.setdefault(session, {}))
+
+            if self.__test is not None:
+                storages.append(self.__tests.setdefault(self.__test, {}))
+
+            for storage in storages:
+                if command not in storage:
+                    storage[command] = Histogram()
+
+                storage[command].add(
+                    latency, retries=retries, payload=payload, error=error,
+                )
+
+    def reset(self):
+        with self.__lock:
+            self.__commands = {}
+            self.__sessions = {}
+            self.__tests = {}
+
+    def to_dict(self):
+        def convert(storage):
+            return dict((k, v.to_dict()) for k, v in storage.items())
+
+        with self.__lock:
+            return {
+                'commands': convert(self.__commands),
+                'sessions': dict((k, convert(v)) for k, v in self.__sessions.items()),
+                'tests': dict((k, convert(v)) for k, v in self.__tests.items()),
+            }
+
+    def to_prometheus(self):
+        """
+        Metrics by command in text format of prometheus
+        """
+        lines = [
+            '# HELP {}_duration_seconds Duration of web driver commands'.format(PROMETHEUS_PREFIX),
+            '# TYPE {}_duration_seconds histogram'.format(PROMETHEUS_PREFIX),
+        ]
+        counters = []
+
+        with self.__lock:
+            commands = sorted(self.__commands.items())
+
+        for command, histogram in commands:
+            label = 'command="{}"'.format(command.replace('\\', '\\\\').replace('"', '\\"'))
+            cumulative = 0
+
+            for le, count in zip(BUCKETS, histogram.buckets):
+                cumulative += count
+                lines.append(
+                    '{}_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                        PROMETHEUS_PREFIX, label, le, cumulative,
+                    ),
+                )
+
+            lines.extend([
+                '{}_duration_seconds_bucket{{{},le="+Inf"}} {}'.format(
+                    PROMETHEUS_PREFIX, label, histogram.count,
+                ),
+                '{}_duration_seconds_sum{{{}}} {}'.format(PROMETHEUS_PREFIX, label, histogram.sum),
+                '{}_duration_seconds_count{{{}}} {}'.format(PROMETHEUS_PREFIX, label, histogram.count),
+            ])
+
+            counters.append((label, histogram))
+
+        for name, atr in (('retries', 'retries'), ('payload_bytes', 'payload'), ('errors', 'errors')):
+            lines.append('# TYPE {}_{}_total counter'.format(PROMETHEUS_PREFIX, name))
+            lines.extend(
+                '{}_{}_total{{{}}} {}'.format(PROMETHEUS_PREFIX, name, label, getattr(histogram, atr))
+                for label, histogram in counters
+            )
+
+        return '\n'.join(lines) + '\n'
+
+    def export_json(self, path):
+        with open(path, 'w') as fp:
+            json.dump(self.to_dict(), fp, indent=2, sort_keys=True)
+
+    def export_prometheus(self, path):
+        with open(path, 'w') as fp:
+            fp.write(self.to_prometheus())
+
+
+metrics = Metrics()
+
+# paths of files for export, set by enable
+_paths = None
+
+
+def get_process_path(path):
+    """
+    Path of file for current process, pid is added before extension
+    """
+    root, ext = os.path.splitext(path)
+
+    return '{}.{}{}'.format(root, os.getpid(), ext)
+
+
+def enable(json_path=None, prometheus_path=None):
+    """
+    Start recording of commands.
+    Metrics will be exported to files at exit from interpreter,
+    each process writes own files with pid in name.
+
+    :param json_path: path to JSON summary
+    :param prometheus_path: path to prometheus textfile
+    :raises: ValueError if metrics are enabled with other paths
+    """
+    global _paths
+
+    paths = (json_path, prometheus_path)
+
+    if metrics.enabled:
+        if _paths is not None and paths != _paths:
+            raise ValueError(
+                'Metrics are enabled with other paths: {}'.format(_paths),
+            )
+        return
+
+    metrics.enabled = True
+
+    if _paths is not None:  # export is registered already
+        _paths = paths
+        return
+
+    _paths = paths
+
+    @atexit.register
+    def export():
+        json_path, prometheus_path = _paths
+
+        if json_path:
+            path = get_process_path(json_path)
+            metrics.export_json(path)
+            logger.debug('Metrics are exported to {}'.format(path))
+
+        if prometheus_path:
+            path = get_process_path(prometheus_path)
+            metrics.export_prometheus(path)
+            logger.debug('Metrics are exported to {}'.format(path))
+
+
+def disable():
+    metrics.enabled = False
+
+
+def get_payload_size(args, kwargs):
+    """
+    Size of arguments of command in JSON
+    """
+    try:
+        return len(json.dumps([args, kwargs], default=repr))
+    except (TypeError, ValueError):
+        return 0
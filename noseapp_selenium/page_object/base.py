@@ -12,6 +12,7 @@ from noseapp_selenium.page_object.wait import WaitComplete
 from noseapp_selenium.page_object.wait import ContentLength
 from noseapp_selenium.tools import get_meta_info_from_object
 from noseapp_selenium.page_object.wait import wait_for_filling
+from noseapp_selenium.page_object.wait import wait_for_quiescence
 
 
 def page_element(query_object):
@@ -161,7 +162,7 @@ class PageObject(BaseInterfaceObjectOfPage):
             self.wait_complete = WaitComplete(self)
 
         self.__driver = to_proxy_object(driver)
-        self.__content_length = ContentLength(driver)
+        self.__content_length = ContentLength(self.__driver)
         self.__wrapper = self.meta.get('wrapper', wrapper)
 
     @property
@@ -222,11 +223,21 @@ class PageObject(BaseInterfaceObjectOfPage):
         else:
             self.__driver = obj_or_driver
 
-    def wait_for_filling(self, steps=None, tries_at_step=None):
+    def wait_for_filling(self, steps=None, tries_at_step=None, timeout=None):
         return wait_for_filling(
             steps=steps,
             tries_at_step=tries_at_step,
             content_length=self.__content_length,
+            timeout=timeout,
+        )
+
+    def wait_for_quiescence(self, quiet_window=None, timeout=None, raise_on_timeout=False):
+        return wait_for_quiescence(
+            self.__driver,
+            quiet_window=quiet_window,
+            timeout=timeout,
+            content_length=self.__content_length,
+            raise_on_timeout=raise_on_timeout,
         )
 
     def wait(self):
@@ -236,6 +247,8 @@ class PageObject(BaseInterfaceObjectOfPage):
         if force:
             get_driver(self.__driver).refresh()
 
+        self.__driver.config.clear_element_cache()
+
         self.forms.refresh()
         self.objects.refresh()
 
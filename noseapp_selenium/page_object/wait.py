@@ -5,19 +5,221 @@ Waiting for load page
 """
 
 import time
-from Queue import Queue
+import logging
 
-from noseapp.utils.common import waiting_for
 from noseapp.utils.common import TimeoutException
 from selenium.common.exceptions import WebDriverException
 
-from noseapp_selenium.tools import get_query_from_driver
+from noseapp_selenium.tools import execute_script
+from noseapp_selenium.proxy import to_proxy_object
+from noseapp_selenium.tools import execute_async_script
+from noseapp_selenium.query.compiler import compile_object
+
+
+logger = logging.getLogger(__name__)
 
 
 DEFAULT_STEPS = 5
 DEFAULT_TRIES_AT_STEP = 5
+DEFAULT_FILLING_TIMEOUT = 30
+
+DEFAULT_QUIET_WINDOW = 0.5
+DEFAULT_QUIESCENCE_TIMEOUT = 30
 
 SLEEP_BETWEEN_TRIES = 0.03
+SLEEP_BETWEEN_PROBES = 0.05
+
+PROBE_FUNCTIONS = """
+function probe(chains, root) {
+    var found = [];
+
+    for (var i = 0; i < chains.length; i++) {
+        var node = root;
+
+        for (var j = 0; node && j < chains[i].length; j++) {
+            node = node.querySelector(chains[i][j]);
+        }
+
+        found.push(!!node);
+    }
+
+    return {ready: document.readyState == 'complete', found: found};
+}
+
+function isComplete(result, readyState, oneOfMany) {
+    if (readyState && !result.ready) {
+        return false;
+    }
+
+    for (var i = 0; i < result.found.length; i++) {
+        if (result.found[i] == oneOfMany) {
+            return oneOfMany;
+        }
+    }
+
+    return !oneOfMany || !result.found.length;
+}
+"""
+
+# state of page by one request
+PROBE_SCRIPT = PROBE_FUNCTIONS + """
+var root = arguments.length > 3 ? arguments[3] : document;
+
+return probe(arguments[0], root);
+"""
+
+# callback is called when page is complete or timeout is expired,
+# null is returned if browser does not support MutationObserver
+WAIT_PROBE_SCRIPT = PROBE_FUNCTIONS + """
+var chains = arguments[0], readyState = arguments[1], oneOfMany = arguments[2];
+var timeout = arguments[3];
+var root = arguments.length > 5 ? arguments[4] : document;
+var done = arguments[arguments.length - 1];
+
+var result = probe(chains, root);
+
+if (isComplete(result, readyState, oneOfMany)) {
+    return done(result);
+}
+
+if (!window.MutationObserver) {
+    return done(null);
+}
+
+var timer, finished = false;
+var observer = new MutationObserver(check);
+
+function check() {
+    result = probe(chains, root);
+
+    if (isComplete(result, readyState, oneOfMany)) {
+        finish();
+    }
+}
+
+function finish() {
+    if (finished) {
+        return;
+    }
+
+    finished = true;
+    observer.disconnect();
+    document.removeEventListener('readystatechange', check);
+    clearTimeout(timer);
+    done(result);
+}
+
+observer.observe(document, {childList: true, subtree: true, attributes: true});
+document.addEventListener('readystatechange', check);
+timer = setTimeout(function () { result = probe(chains, root); finish(); }, timeout);
+"""
+
+
+# length of HTML of element or body, web element is passed if it is client
+CONTENT_LENGTH_SCRIPT = """
+var root = arguments.length ? arguments[0] : document.body;
+
+return root ? root.innerHTML.length : 0;
+"""
+
+
+# callback is called when there were not mutations of DOM and requests
+# for quiet window or deadline is expired, requests are counted
+# after first call of script in document only,
+# null is returned if browser does not support MutationObserver
+QUIESCENCE_SCRIPT = """
+var quietWindow = arguments[0], timeout = arguments[1];
+var root = arguments.length > 3 ? arguments[2] : document;
+var done = arguments[arguments.length - 1];
+
+if (!window.MutationObserver) {
+    return done(null);
+}
+
+var monitor = window.__noseappSeleniumMonitor;
+
+if (!monitor) {
+    monitor = window.__noseappSeleniumMonitor = {requests: 0, changed: Date.now()};
+
+    var finish = function () {
+        monitor.requests--;
+        monitor.changed = Date.now();
+    };
+
+    var send = XMLHttpRequest.prototype.send;
+
+    XMLHttpRequest.prototype.send = function () {
+        monitor.requests++;
+        this.addEventListener('loadend', finish);
+
+        try {
+            return send.apply(this, arguments);
+        } catch (e) {
+            this.removeEventListener('loadend', finish);
+            finish();
+            throw e;
+        }
+    };
+
+    if (window.fetch) {
+        var fetch = window.fetch;
+
+        window.fetch = function () {
+            monitor.requests++;
+
+            try {
+                var promise = fetch.apply(this, arguments);
+            } catch (e) {
+                finish();
+                throw e;
+            }
+
+            promise.then(finish, finish);
+
+            return promise;
+        };
+    }
+}
+
+var changed = Date.now(), deadline = Date.now() + timeout;
+var observer = new MutationObserver(function () { changed = Date.now(); });
+
+observer.observe(root, {childList: true, subtree: true, attributes: true, characterData: true});
+
+(function check() {
+    var now = Date.now();
+
+    if (!monitor.requests && now - Math.max(changed, monitor.changed) >= quietWindow) {
+        observer.disconnect();
+        return done({quiet: true, requests: 0});
+    }
+
+    if (now >= deadline) {
+        observer.disconnect();
+        return done({quiet: false, requests: monitor.requests});
+    }
+
+    setTimeout(check, Math.min(50, quietWindow));
+})();
+"""
+
+
+def is_complete(result, ready_state, one_of_many):
+    """
+    Check result of probe
+
+    :param result: {'ready': bool, 'found': [bool]}
+    """
+    if ready_state and not result['ready']:
+        return False
+
+    if not result['found']:
+        return True
+
+    if one_of_many:
+        return any(result['found'])
+
+    return all(result['found'])
 
 
 class WaitConfig(object):
@@ -30,11 +232,19 @@ class WaitConfig(object):
                  objects=None,
                  one_of_many=False,
                  wait_for_filling=True,
-                 ready_state_complete=False):
+                 ready_state_complete=False,
+                 wait_for_quiescence=False,
+                 quiet_window=DEFAULT_QUIET_WINDOW):
+        """
+        :param wait_for_quiescence: wait for page without mutations of DOM
+          and requests for quiet window seconds instead of wait_for_filling
+        """
         self.__timeout = timeout
         self.__one_of_many = one_of_many
         self.__objects = objects or tuple()
+        self.__quiet_window = quiet_window
         self.__wait_for_filling = wait_for_filling
+        self.__wait_for_quiescence = wait_for_quiescence
         self.__ready_state_complete = ready_state_complete
 
     @property
@@ -57,6 +267,14 @@ class WaitConfig(object):
     def ready_state_complete(self):
         return self.__ready_state_complete
 
+    @property
+    def wait_for_quiescence(self):
+        return self.__wait_for_quiescence
+
+    @property
+    def quiet_window(self):
+        return self.__quiet_window
+
 
 class WaitComplete(object):
     """
@@ -68,112 +286,123 @@ class WaitComplete(object):
         self.config = page.meta.get('wait_config', WaitConfig())
 
     def __call__(self):
-        if self.config.ready_state_complete:
-            self.__ready_state_complete__()
+        if self.config.ready_state_complete or self.config.objects:
+            self.__wait_probe__()
 
-        if self.config.wait_for_filling:
+        if self.config.wait_for_quiescence:
+            self.__page.wait_for_quiescence(
+                quiet_window=self.config.quiet_window,
+                timeout=self.config.timeout,
+            )
+        elif self.config.wait_for_filling:
             self.__page.wait_for_filling()
 
-        wait_funcs = {
-            False: self.__wait_all__,
-            True: self.__wait_one_of_many__,
-        }
-        wait_funcs[bool(self.config.one_of_many)]()
-
     def __repr__(self):
         return '<WaitComplete of <{}>>'.format(self.__page.__class__.__name__)
 
-    def __ready_state_complete__(self):
-        waiting_for(
-            lambda: self.__page.driver.execute_script(
-                'return document.readyState == "complete"',
-            ),
-            timeout=self.config.timeout,
-        )
-
-    def __wait_all__(self):
-        if not self.config.objects:
-            return
+    def __chains__(self):
+        """
+        Css of wrapper and object for each object
+        """
+        wrapper = self.__page.wrapper
+        scopes = [compile_object(wrapper)] if wrapper else []
 
-        queue = Queue()
-        map(queue.put_nowait, self.config.objects)
-        t_start = time.time()
+        return [scopes + [compile_object(obj)] for obj in self.config.objects]
 
-        query = get_query_from_driver(
-            self.__page.driver,
-            wrapper=self.__page.wrapper,
-        )
+    def __wait_probe__(self):
+        """
+        Wait for ready state and objects by one probe of page.
+        Probe is waiting inside browser if ASYNC_WAIT is enabled,
+        else or if page is loading probe is repeated until timeout.
+        """
+        driver = self.__page.driver
+        timeout = self.config.timeout
+        ready_state = bool(self.config.ready_state_complete)
+        one_of_many = bool(self.config.one_of_many)
 
-        while (time.time() <= t_start + self.config.timeout) or (not queue.empty()):
-            obj = queue.get()
-
-            if not query.from_object(obj).exist:
-                queue.put(obj)
-        else:
-            if not queue.empty():
-                raise TimeoutException(
-                    'Could not wait ready page "{}". Timeout "{}" exceeded.'.format(
-                        self.__page.__class__.__name__, self.config.timeout,
-                    ),
+        chains = self.__chains__()
+        t_start = time.time()
+        result = None
+
+        if driver.config.ASYNC_WAIT:
+            try:
+                result = execute_async_script(
+                    driver,
+                    WAIT_PROBE_SCRIPT,
+                    timeout,
+                    chains,
+                    ready_state,
+                    one_of_many,
+                    int(timeout * 1000),
                 )
+            except WebDriverException as e:  # page is loading
+                logger.debug(u'Async probe is failed: {}'.format(e))
 
-    def __wait_one_of_many__(self):
-        if not self.config.objects:
-            return
+        if result is None:
+            result = {'ready': False, 'found': [False] * len(chains)}
 
-        queue = Queue()
-        map(queue.put_nowait, self.config.objects)
-        t_start = time.time()
+            while True:
+                try:
+                    result = execute_script(
+                        driver, PROBE_SCRIPT, chains, ready_state, one_of_many,
+                    )
+                except WebDriverException:  # page is loading
+                    pass
 
-        query = get_query_from_driver(
-            self.__page.driver,
-            wrapper=self.__page.wrapper,
-        )
+                if is_complete(result, ready_state, one_of_many):
+                    break
 
-        while time.time() <= t_start + self.config.timeout:
-            obj = queue.get()
+                if time.time() >= t_start + timeout:
+                    break
 
-            if query.from_object(obj).exist:
-                break
+                time.sleep(SLEEP_BETWEEN_PROBES)
+
+        if not is_complete(result, ready_state, one_of_many):
+            missing = [
+                unicode(obj)
+                for obj, found in zip(self.config.objects, result['found'])
+                if not found
+            ]
 
-            queue.put(obj)
-        else:
             raise TimeoutException(
-                'Could not wait ready page "{}". Timeout "{}" exceeded.'.format(
-                    self.__page.__class__.__name__, self.config.timeout,
+                u'Could not wait ready page "{}". Timeout "{}" exceeded. '
+                u'Ready state: {}. Not found: {}'.format(
+                    self.__page.__class__.__name__,
+                    timeout,
+                    'complete' if result['ready'] else 'not complete',
+                    u', '.join(missing) or '-',
                 ),
             )
 
 
 class ContentLength(object):
     """
-    Length of HTML string at current moment
+    Length of HTML string at current moment.
+    Length is measured inside browser on first use.
     """
 
     def __init__(self, client):
-        self.__client = client
-        self.__value = self._get()
+        self.__client = to_proxy_object(client)
+        self.__value = None
 
     def __int__(self):
+        if self.__value is None:
+            self.__value = self._get()
+
         return self.__value
 
     def __str__(self):
-        return str(self.__value)
+        return str(int(self))
 
     def __repr__(self):
         return self.__str__()
 
     def __unicode__(self):
-        return unicode(self.__value)
+        return unicode(int(self))
 
     def _get(self):
-        if hasattr(self.__client, 'get_attribute'):
-            client = self.__client
-        else:
-            client = self.__client.query.body().first()
-
         try:
-            return len(client.obj.innerHTML)
+            return execute_script(self.__client, CONTENT_LENGTH_SCRIPT) or 0
         except WebDriverException:
             return 0
 
@@ -185,7 +414,7 @@ class ContentLength(object):
         :return: bool
         """
         current_value = self._get()
-        is_update = current_value > self.__value or current_value < self.__value
+        is_update = self.__value is not None and current_value != self.__value
         self.__value = current_value
         return is_update
 
@@ -212,28 +441,40 @@ class TriesStep(object):
 
 class WaitForFilling(object):
 
-    def __init__(self, content_length, steps=None, tries_at_step=None):
+    def __init__(self, content_length, steps=None, tries_at_step=None, timeout=None):
         self.__steps = steps or DEFAULT_STEPS
         self.__tries_at_step = tries_at_step
         self.__content_length = content_length
+        self.__timeout = timeout or DEFAULT_FILLING_TIMEOUT
 
     def perform(self):
-        statuses = []
+        """
+        Wait while content length is changed,
+        but not longer than timeout
+        """
+        t_end = time.time() + self.__timeout
 
-        for _ in xrange(self.__steps):
-            step = TriesStep(
-                self.__content_length,
-                tries=self.__tries_at_step,
-            )
-            statuses.append(step.been_update())
+        while True:
+            statuses = []
+
+            for _ in xrange(self.__steps):
+                step = TriesStep(
+                    self.__content_length,
+                    tries=self.__tries_at_step,
+                )
+                statuses.append(step.been_update())
+
+            if True not in statuses:
+                break
 
-        if True in statuses:
-            self.perform()
+            if time.time() >= t_end:
+                logger.debug('Content is changing after timeout "{}"'.format(self.__timeout))
+                break
 
         return int(self.__content_length)
 
 
-def wait_for_filling(client=None, content_length=None, steps=None, tries_at_step=None):
+def wait_for_filling(client=None, content_length=None, steps=None, tries_at_step=None, timeout=None):
     if not client and not content_length:
         raise ValueError('"client" or "content_length" param is required')
 
@@ -243,6 +484,51 @@ def wait_for_filling(client=None, content_length=None, steps=None, tries_at_step
         content_length,
         steps=steps,
         tries_at_step=tries_at_step,
+        timeout=timeout,
     )
 
     return wait.perform()
+
+
+def wait_for_quiescence(client,
+                        quiet_window=None,
+                        timeout=None,
+                        content_length=None,
+                        raise_on_timeout=False):
+    """
+    Wait inside browser for page without mutations of DOM
+    and without XHR and fetch requests for quiet window.
+    Content length is waited for if browser can not do it.
+    Page which is changing after timeout is logged like in wait_for_filling.
+
+    :param client: web driver or web element, mutations are observed inside element
+    :param quiet_window: seconds without changes
+    :param timeout: hard deadline in seconds
+    :param raise_on_timeout: raise exception if page is changing after timeout
+    :raises: TimeoutException if raise_on_timeout is True
+    """
+    client = to_proxy_object(client)
+    quiet_window = quiet_window or DEFAULT_QUIET_WINDOW
+    timeout = timeout or DEFAULT_QUIESCENCE_TIMEOUT
+
+    result = execute_async_script(
+        client,
+        QUIESCENCE_SCRIPT,
+        timeout,
+        int(quiet_window * 1000),
+        int(timeout * 1000),
+    )
+
+    if result is None:
+        wait_for_filling(client=client, content_length=content_length, timeout=timeout)
+        return
+
+    if not result['quiet']:
+        message = 'Page is not quiet for "{}" sec. Timeout "{}" exceeded. Requests in flight: {}'.format(
+            quiet_window, timeout, result['requests'],
+        )
+
+        if raise_on_timeout:
+            raise TimeoutException(message)
+
+        logger.debug(message)
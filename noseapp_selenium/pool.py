@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pool of web driver sessions
+"""
+
+import time
+import atexit
+import logging
+import threading
+from urllib2 import URLError
+
+from selenium.common.exceptions import WebDriverException
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_POOL_IDLE_TIMEOUT = 300
+
+CLEAR_STORAGE_SCRIPT = """
+try {
+    window.localStorage.clear();
+    window.sessionStorage.clear();
+} catch (e) {}
+"""
+
+HEAP_SIZE_SCRIPT = """
+if (window.performance && window.performance.memory) {
+    return window.performance.memory.usedJSHeapSize;
+}
+return null;
+"""
+
+
+def is_alive(driver):
+    """
+    Health check of session
+
+    :param driver: ProxyObject
+    """
+    try:
+        return bool(driver.orig().window_handles)
+    except (URLError, WebDriverException):
+        return False
+
+
+def get_heap_size(driver):
+    """
+    Get size of used js heap in bytes.
+    None if browser does not support it.
+
+    :param driver: ProxyObject
+    """
+    try:
+        return driver.orig().execute_script(HEAP_SIZE_SCRIPT)
+    except (URLError, WebDriverException):
+        return None
+
+
+def reset_driver(driver):
+    """
+    Cheap reset of session state instead of creating new session.
+    Clear storages and cookies, close all windows except first, go to blank page.
+    Cookies and storages are cleared for origin of current page only.
+
+    :param driver: ProxyObject
+    """
+    orig = driver.orig()
+
+    handles = orig.window_handles
+
+    for handle in handles[1:]:
+        orig.switch_to.window(handle)
+        orig.close()
+
+    orig.switch_to.window(handles[0])
+
+    orig.execute_script(CLEAR_STORAGE_SCRIPT)
+    orig.delete_all_cookies()
+    orig.get('about:blank')
+
+    driver.config.invalidate()
+    driver.config.state.reset()
+    driver.config.apply()
+
+    if driver.config.recorder is not None:
+        driver.config.recorder.clear()
+
+
+def quit_driver(driver):
+    """
+    Real quit of session. Pool will not be used.
+
+    :param driver: ProxyObject
+    """
+    orig = driver.orig()
+    orig.__dict__.pop('quit', None)
+    quit = orig.__dict__.pop('__quit__', orig.quit)
+
+    try:
+        quit()
+    except (URLError, WebDriverException) as e:
+        logger.debug('Error on quit from session: {}'.format(e))
+
+
+class RecyclePolicy(object):
+    """
+    Conditions for replacing of old session by new session
+    """
+
+    def __init__(self, max_age=None, max_commands=None, max_heap_size=None):
+        """
+        :param max_age: seconds from start of session
+        :param max_commands: count of commands sent through ProxyObject
+        :param max_heap_size: bytes of used js heap, chrome only
+        """
+        self.max_age = max_age
+        self.max_commands = max_commands
+        self.max_heap_size = max_heap_size
+
+    def __repr__(self):
+        return '<RecyclePolicy max_age={} max_commands={} max_heap_size={}>'.format(
+            self.max_age, self.max_commands, self.max_heap_size,
+        )
+
+    def need_recycle(self, driver, check_heap=True):
+        """
+        Check that session must be replaced
+
+        :param driver: ProxyObject
+        :param check_heap: allow to take sample of js heap
+        """
+        config = driver.config
+
+        if self.max_age and time.time() - config.created > self.max_age:
+            logger.debug('Session {} is too old'.format(driver.orig().session_id))
+            return True
+
+        if self.max_commands and config.commands > self.max_commands:
+            logger.debug('Session {} has too many commands'.format(driver.orig().session_id))
+            return True
+
+        if self.max_heap_size and check_heap:
+            heap_size = get_heap_size(driver)
+
+            if heap_size and heap_size > self.max_heap_size:
+                logger.debug('Session {} has too big js heap'.format(driver.orig().session_id))
+                return True
+
+        return False
+
+
+class DriverPool(object):
+    """
+    Storage of idle sessions.
+    Sessions are returning to pool on quit.
+    """
+
+    def __init__(self,
+                 size=DEFAULT_POOL_SIZE,
+                 idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT,
+                 recycle_policy=None):
+        self.__size = size
+        self.__idle_timeout = idle_timeout
+        self.__recycle_policy = recycle_policy
+
+        self.__idle = []
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__idle)
+
+    def __repr__(self):
+        return '<DriverPool size={} idle={}>'.format(self.__size, len(self.__idle))
+
+    @property
+    def size(self):
+        return self.__size
+
+    @property
+    def idle_timeout(self):
+        return self.__idle_timeout
+
+    @property
+    def recycle_policy(self):
+        return self.__recycle_policy
+
+    def _evict(self):
+        """
+        Get sessions which were idle for a long time
+        """
+        if not self.__idle_timeout:
+            return []
+
+        deadline = time.time() - self.__idle_timeout
+        evicted = [d for d, released in self.__idle if released < deadline]
+        self.__idle = [(d, r) for d, r in self.__idle if r >= deadline]
+
+        return evicted
+
+    def acquire(self):
+        """
+        Get healthy session from pool.
+        Return None if pool is empty.
+        """
+        while True:
+            with self.__lock:
+                evicted = self._evict()
+                driver = self.__idle.pop()[0] if self.__idle else None
+
+            map(quit_driver, evicted)
+
+            if driver is None:
+                return None
+
+            recycle = self.__recycle_policy and self.__recycle_policy.need_recycle(
+                driver, check_heap=False,
+            )
+
+            if not recycle and is_alive(driver):
+                logger.debug('Session {} was taken from pool'.format(driver.orig().session_id))
+                return self.bind(driver)
+
+            quit_driver(driver)
+
+    def release(self, driver):
+        """
+        Return session to pool.
+        Session will be reset or closed if pool is full
+        or session must be recycled.
+        """
+        if self.__recycle_policy and self.__recycle_policy.need_recycle(driver):
+            quit_driver(driver)
+            return
+
+        try:
+            reset_driver(driver)
+        except (URLError, WebDriverException) as e:
+            logger.debug('Could not reset session: {}'.format(e))
+            quit_driver(driver)
+            return
+
+        with self.__lock:
+            evicted = self._evict()
+
+            if len(self.__idle) < self.__size:
+                self.__idle.append((driver, time.time()))
+            else:
+                evicted.append(driver)
+
+        map(quit_driver, evicted)
+
+    def bind(self, driver):
+        """
+        Session will be returned to pool on first quit,
+        next calls of quit do nothing
+        """
+        orig = driver.orig()
+
+        if '__quit__' not in orig.__dict__:
+            orig.__dict__['__quit__'] = orig.quit
+
+        released = []
+
+        def quit():
+            if not released:
+                released.append(True)
+                self.release(driver)
+
+        driver.quit = quit
+
+        return driver
+
+    def close(self):
+        """
+        Quit from all idle sessions
+        """
+        with self.__lock:
+            idle, self.__idle = self.__idle, []
+
+        for driver, _ in idle:
+            quit_driver(driver)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key,
+             size=DEFAULT_POOL_SIZE,
+             idle_timeout=DEFAULT_POOL_IDLE_TIMEOUT,
+             recycle_policy=None):
+    """
+    Get pool of sessions by key.
+    One pool will be created for key inside process.
+    """
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = DriverPool(
+                size=size,
+                idle_timeout=idle_timeout,
+                recycle_policy=recycle_policy,
+            )
+
+        return _pools[key]
+
+
+@atexit.register
+def close_pools():
+    for pool in _pools.values():
+        pool.close()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""
+Background creating of web driver sessions
+"""
+
+import time
+import atexit
+import logging
+import threading
+
+from noseapp_selenium.pool import is_alive
+from noseapp_selenium.pool import quit_driver
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_PREFETCH_DEPTH = 1
+# seconds for waiting of starting sessions on close
+DEFAULT_CLOSE_TIMEOUT = 30
+
+
+class DriverPrefetcher(object):
+    """
+    Keep sessions starting in background threads ahead of demand
+    """
+
+    def __init__(self, factory, depth=DEFAULT_PREFETCH_DEPTH):
+        """
+        :param factory: callable for creating of session
+        :param depth: count of ready or starting sessions
+        """
+        self.__factory = factory
+        self.__depth = depth
+
+        self.__ready = []
+        self.__starting = 0
+        self.__threads = []
+        self.__closed = False
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__ready)
+
+    def __repr__(self):
+        return '<DriverPrefetcher depth={} ready={} starting={}>'.format(
+            self.__depth, len(self.__ready), self.__starting,
+        )
+
+    @property
+    def depth(self):
+        return self.__depth
+
+    def _start(self):
+        try:
+            driver = self.__factory()
+        except BaseException as e:
+            logger.debug('Could not prefetch session: {}'.format(e))
+            driver = None
+
+        with self.__lock:
+            self.__starting -= 1
+            self.__threads.remove(threading.current_thread())
+
+            if driver is not None and not self.__closed:
+                self.__ready.append(driver)
+                driver = None
+
+        if driver is not None:
+            quit_driver(driver)
+
+    def fill(self):
+        """
+        Start sessions up to depth
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+
+            count = self.__depth - len(self.__ready) - self.__starting
+            self.__starting += max(count, 0)
+
+            threads = [
+                threading.Thread(target=self._start, name='noseapp-selenium-prefetch')
+                for _ in xrange(count)
+            ]
+            self.__threads.extend(threads)
+
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+    def get(self):
+        """
+        Get ready session without waiting.
+        Dead sessions are closed and skipped.
+        Return None if ready session is not found.
+        """
+        while True:
+            with self.__lock:
+                driver = self.__ready.pop(0) if self.__ready else None
+
+            if driver is None or is_alive(driver):
+                break
+
+            logger.debug('Prefetched session is dead: {}'.format(driver))
+            quit_driver(driver)
+
+        self.fill()
+
+        return driver
+
+    def close(self, timeout=DEFAULT_CLOSE_TIMEOUT):
+        """
+        Quit from all unused sessions.
+        Starting sessions are waited for timeout, they are closed on start.
+        """
+        with self.__lock:
+            self.__closed = True
+            ready, self.__ready = self.__ready, []
+            threads = list(self.__threads)
+
+        map(quit_driver, ready)
+
+        t_end = time.time() + timeout
+
+        for thread in threads:
+            thread.join(max(t_end - time.time(), 0))
+
+        if any(thread.is_alive() for thread in threads):
+            logger.debug('Sessions are starting after timeout "{}"'.format(timeout))
+
+
+_prefetchers = {}
+_prefetchers_lock = threading.Lock()
+
+
+def get_prefetcher(key, factory, depth=DEFAULT_PREFETCH_DEPTH):
+    """
+    Get prefetcher by key.
+    One prefetcher will be created for key inside process.
+    """
+    with _prefetchers_lock:
+        if key not in _prefetchers:
+            _prefetchers[key] = DriverPrefetcher(factory, depth=depth)
+
+        return _prefetchers[key]
+
+
+@atexit.register
+def close_prefetchers():
+    for prefetcher in _prefetchers.values():
+        prefetcher.close()
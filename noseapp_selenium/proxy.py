@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import time
 from types import MethodType
+from functools import wraps
 from contextlib import contextmanager
 
 from selenium.webdriver.remote.webdriver import WebDriver
@@ -8,25 +10,58 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.common.action_chains import ActionChains as __ActionChains
 
 from noseapp_selenium.tools import polling
+from noseapp_selenium.metrics import metrics
+from noseapp_selenium.metrics import get_payload_size
+from noseapp_selenium.tools import get_polling_retries
 from noseapp_selenium.tools import make_object
+from noseapp_selenium.state import STATE_COMMANDS
 from noseapp_selenium.query.processor import QueryProcessor
 
 
-def factory_method(f, config):
+def factory_method(f, config, driver=None):
     """
     Factory for create WebElement instance
+
+    :param driver: ProxyObject of web driver for created instances
     """
+    # element found by single find can be found again if it is stale
+    locate = f.__name__.startswith('find_element')
+    # commands which change state of session are tracked by config
+    track = f.__name__ in STATE_COMMANDS
+
+    @wraps(f)
     def wrapper(*args, **kwargs):
-        result = f(*args, **kwargs)
+        if locate:
+            config.state.sync_implicitly_wait()
+        elif track and config.state.is_redundant(f.__name__, args, kwargs):
+            return None
+
+        config.record(f.__name__, args)
+
+        if track:
+            try:
+                result = f(*args, **kwargs)
+            except BaseException:
+                config.invalidate()
+                raise
+
+            config.track(f.__name__, args, kwargs)
+        else:
+            result = f(*args, **kwargs)
 
         if isinstance(result, WebElement):
-            return ProxyObject(result, config=config)
+            obj = ProxyObject(result, config=config, driver=driver)
+
+            if locate:
+                obj.__dict__['locator'] = lambda: f(*args, **kwargs)
+
+            return obj
 
         if isinstance(result, list):
             we_list = []
             for obj in result:
                 if isinstance(obj, WebElement):
-                    we_list.append(ProxyObject(obj, config=config))
+                    we_list.append(ProxyObject(obj, config=config, driver=driver))
                 else:
                     return result
             return we_list
@@ -36,6 +71,38 @@ def factory_method(f, config):
     return wrapper
 
 
+def instrument(f, name, wrapped, with_polling):
+    """
+    Record latency, retries and payload of command to metrics
+    """
+    if isinstance(wrapped, WebDriver):
+        session = wrapped.session_id
+    else:
+        session = wrapped.parent.session_id
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        t_start = time.time()
+        error = False
+
+        try:
+            return f(*args, **kwargs)
+        except BaseException:
+            error = True
+            raise
+        finally:
+            metrics.record(
+                name,
+                time.time() - t_start,
+                session=session,
+                retries=get_polling_retries() if with_polling else 0,
+                payload=get_payload_size(args, kwargs),
+                error=error,
+            )
+
+    return wrapper
+
+
 def to_proxy_object(obj, **kw):
     """
     Convert instance to ProxyObject
@@ -48,17 +115,20 @@ def to_proxy_object(obj, **kw):
 
 def get_driver(driver):
     """
-    Get instance of web driver
+    Get instance of web driver.
+    Result will be cached inside ProxyObject of web element.
     """
     if isinstance(driver.orig(), WebDriver):
-        d = driver
-    else:
-        d = ProxyObject(driver._parent)
+        return driver
+
+    d = driver.__dict__['driver']
 
-    if isinstance(d.orig(), WebDriver):
-        return d
+    if d is None:
+        d = driver.__dict__['driver'] = get_driver(
+            ProxyObject(driver.orig()._parent, config=driver.config),
+        )
 
-    return get_driver(d)
+    return d
 
 
 class ActionChains(__ActionChains):
@@ -88,13 +158,22 @@ class ProxyObject(object):
     Proxy for WebElement or WebDriver instance
     """
 
-    def __init__(self, wrapped, config=None):
+    def __init__(self, wrapped, config=None, driver=None):
+        """
+        :param wrapped: instance of WebDriver or WebElement class
+        :param config: DriverConfig instance
+        :param driver: ProxyObject of web driver, will be found if None
+        """
         self.__dict__['polling'] = True
         self.__dict__['wrapped'] = wrapped
         self.__dict__['config'] = config or wrapped.config
+        self.__dict__['driver'] = driver
+        self.__dict__['methods'] = {}
+        self.__dict__['locator'] = None
 
-        wrapped.query = QueryProcessor(self)
-        wrapped.action_chains = ActionChains(self)
+        # will be created on first access
+        self.__dict__['query'] = None
+        self.__dict__['action_chains'] = None
 
     @property
     def config(self):
@@ -102,11 +181,17 @@ class ProxyObject(object):
 
     @property
     def query(self):
-        return self.__dict__['wrapped'].query
+        if self.__dict__['query'] is None:
+            self.__dict__['query'] = QueryProcessor(self)
+
+        return self.__dict__['query']
 
     @property
     def action_chains(self):
-        return self.__dict__['wrapped'].action_chains
+        if self.__dict__['action_chains'] is None:
+            self.__dict__['action_chains'] = ActionChains(self)
+
+        return self.__dict__['action_chains']
 
     @contextmanager
     def disable_polling(self):
@@ -129,31 +214,81 @@ class ProxyObject(object):
     def orig(self):
         return self.__dict__['wrapped']
 
+    def re_resolve(self):
+        """
+        Find stale web element again by the same query
+        """
+        if self.__dict__['locator'] is None:
+            raise TypeError('{} can not be found again'.format(repr(self)))
+
+        self.__dict__['wrapped'] = self.__dict__['locator']()
+        self.__dict__['methods'].clear()
+
     @property
     def obj(self):
-        return make_object(self.__dict__['wrapped'], allow_raise=False)
+        return make_object(self.__dict__['wrapped'], allow_raise=False, client=self)
 
     def __getattr__(self, item):
         wrapped = self.__dict__['wrapped']
         config = self.__dict__['config']
 
-        allow_polling = config.POLLING_TIMEOUT and self.__dict__['polling']
-
         attr = getattr(wrapped, item)
 
         if callable(attr) and type(attr) == MethodType:
-            if allow_polling:
-                return polling(
-                    callback=factory_method(attr, config),
-                    timeout=config.POLLING_TIMEOUT,
+            driver = self if isinstance(wrapped, WebDriver) else self.__dict__['driver']
+            timeout = config.POLLING_TIMEOUT if self.__dict__['polling'] else None
+
+            # wrapped methods are cached by name, polling state and metrics state,
+            # cache is valid while attribute is the same function
+            key = (item, timeout, metrics.enabled)
+            cached = self.__dict__['methods'].get(key)
+
+            if cached is not None and cached[0] is attr.__func__:
+                return cached[1]
+
+            if timeout and self.__dict__['locator'] is not None:
+                method = polling(
+                    callback=factory_method(self.__method(item), config, driver=driver),
+                    timeout=timeout,
+                    re_resolve=self.re_resolve,
+                )
+            elif timeout:
+                method = polling(
+                    callback=factory_method(attr, config, driver=driver),
+                    timeout=timeout,
                 )
+            else:
+                method = factory_method(attr, config, driver=driver)
+
+            if metrics.enabled:
+                method = instrument(method, item, wrapped, bool(timeout))
+
+            self.__dict__['methods'][key] = (attr.__func__, method)
 
-            return factory_method(attr, config)
+            return method
+
+        if item == 'switch_to':
+            config.invalidate()
 
         return attr
 
+    def __method(self, name):
+        """
+        Method of current wrapped object, it can be changed by re_resolve
+        """
+        def method(*args, **kwargs):
+            return getattr(self.__dict__['wrapped'], name)(*args, **kwargs)
+
+        method.__name__ = name
+
+        return method
+
     def __setattr__(self, key, value):
-        return setattr(self.__dict__['wrapped'], key, value)
+        setattr(self.__dict__['wrapped'], key, value)
+
+        for cached_key in self.__dict__['methods'].keys():
+            if cached_key[0] == key:
+                del self.__dict__['methods'][cached_key]
 
     def __repr__(self):
         return 'ProxyObject: {}'.format(
@@ -4,6 +4,7 @@ from noseapp_selenium.query.base import contains
 from noseapp_selenium.query.base import QueryObject
 from noseapp_selenium.query.result import QueryResult
 from noseapp_selenium.query.processor import QueryProcessor
+from noseapp_selenium.query.processor import ScopedQueryProcessor
 
 
 __all__ = (
@@ -11,4 +12,5 @@ __all__ = (
     QueryResult,
     QueryObject,
     QueryProcessor,
+    ScopedQueryProcessor,
 )
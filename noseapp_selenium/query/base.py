@@ -33,6 +33,15 @@ class _Contains(object):
     def __repr__(self):
         return self.value
 
+    def __eq__(self, other):
+        return isinstance(other, _Contains) and self.value == other.value
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((_Contains, self.value))
+
     def __str__(self):
         return str(self.value)
 
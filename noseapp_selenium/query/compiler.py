@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compilation of css selectors from queries
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from noseapp_selenium.query.base import contains
+
+
+DEFAULT_CACHE_SIZE = 1024
+
+REPLACE_ATTRIBUTES = {
+    '_id': 'id',
+    '_class': 'class',
+    '_type': 'type',
+}
+
+REPLACE_TAGS = {
+    'link': 'a',
+}
+
+# value of id can be used as "#id" without escaping
+IDENTIFIER_REGEXP = re.compile(r'^-?[_a-zA-Z][_a-zA-Z0-9-]*$')
+
+
+def replace_tag(tag_name):
+    """
+    Replace name of tag, for usability only
+    """
+    return REPLACE_TAGS.get(tag_name, tag_name)
+
+
+def replace_attribute(atr_name):
+    """
+    Replace name of attribute for
+    exclusion conflict with global names
+    """
+    return REPLACE_ATTRIBUTES.get(atr_name, atr_name).replace('_', '-')
+
+
+def to_text(value):
+    if isinstance(value, str):
+        return value.decode('utf-8')
+
+    return unicode(value)
+
+
+def escape_value(value):
+    """
+    Escape value for css string in double quotes
+    """
+    return to_text(value)\
+        .replace(u'\\', u'\\\\')\
+        .replace(u'"', u'\\"')\
+        .replace(u'\n', u'\\a ')\
+        .replace(u'\r', u'\\d ')\
+        .replace(u'\f', u'\\c ')
+
+
+def compile_attribute(atr_name, value):
+    atr_name = replace_attribute(atr_name)
+
+    if isinstance(value, contains):
+        return u'[{}*="{}"]'.format(atr_name, escape_value(value))
+
+    if atr_name == 'id' and IDENTIFIER_REGEXP.match(to_text(value)):
+        return u'#{}'.format(to_text(value))
+
+    return u'[{}="{}"]'.format(atr_name, escape_value(value))
+
+
+class SelectorCompiler(object):
+    """
+    Compile tag and attributes to css.
+    Compiled selectors are cached.
+    """
+
+    def __init__(self, size=DEFAULT_CACHE_SIZE):
+        self.__size = size
+        self.__cache = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__cache)
+
+    def __call__(self, tag, selector):
+        """
+        :param tag: html tag name
+        :param selector: attributes of tag
+        :type selector: dict
+        """
+        items = tuple(sorted(selector.items()))
+        key = (tag, items)
+
+        try:
+            hash(key)
+        except TypeError:  # unhashable value
+            return self.compile(tag, items)
+
+        with self.__lock:
+            try:
+                css = self.__cache.pop(key)
+            except KeyError:
+                css = self.compile(tag, items)
+
+            self.__cache[key] = css
+
+            if len(self.__cache) > self.__size:
+                self.__cache.popitem(last=False)
+
+        return css
+
+    @staticmethod
+    def compile(tag, items):
+        query = [replace_tag(tag)]
+        query.extend(compile_attribute(atr, val) for atr, val in items)
+
+        return u''.join(query)
+
+    def clear(self):
+        with self.__lock:
+            self.__cache.clear()
+
+
+compile_selector = SelectorCompiler()
+
+
+def compile_object(obj):
+    """
+    Compile QueryObject instance.
+    Result is saved inside instance while tag and selector are the same objects.
+
+    :type obj: noseapp_selenium.query.QueryObject
+    """
+    compiled = obj.__dict__.get('__compiled__')
+
+    if compiled is not None and compiled[0] is obj.tag and compiled[1] is obj.selector:
+        return compiled[2]
+
+    css = compile_selector(obj.tag, obj.selector)
+    obj.__dict__['__compiled__'] = (obj.tag, obj.selector, css)
+
+    return css
@@ -3,7 +3,9 @@
 from selenium.webdriver.remote.webelement import WebElement
 
 from noseapp_selenium.query.base import QueryObject
+from noseapp_selenium.query.result import QueryResult
 from noseapp_selenium.query.handler import make_result
+from noseapp_selenium.query.compiler import compile_object
 
 
 class QueryProcessor(object):
@@ -51,7 +53,16 @@ class QueryProcessor(object):
         if not isinstance(obj, QueryObject):
             raise TypeError('"{}" is not QueryObject instance'.format(type(obj)))
 
-        return self.__getattr__(obj.tag)(**obj.selector)
+        return QueryResult(self.__client, compile_object(obj))
+
+    def scoped(self, wrapper):
+        """
+        Create processor for queries inside first element of wrapper.
+        Wrapper and query will be resolved by one request.
+
+        :type wrapper: QueryObject
+        """
+        return ScopedQueryProcessor(self.__client, [compile_object(wrapper)])
 
     def get_text(self):
         """
@@ -64,3 +75,64 @@ class QueryProcessor(object):
             return self.__client.text
 
         return self.__client.find_element_by_tag_name('body').text
+
+
+class ScopedQueryProcessor(object):
+    """
+    Queries inside chain of wrappers.
+    First element of each wrapper is used like area of search.
+
+    Example:
+
+        query = QueryProcessor(driver).scoped(QueryObject('form', id='login'))
+        query.input(name='password').first()
+    """
+
+    def __init__(self, client, scopes):
+        """
+        :param client: instance of WebDriver or WebElement class
+        :param scopes: css selectors of wrappers
+        """
+        self.__client = client
+        self.__scopes = tuple(scopes)
+
+    def __getattr__(self, item):
+        return make_result(self.__client, item, scopes=self.__scopes)
+
+    def __call__(self, client):
+        return QueryProcessor(client)
+
+    @property
+    def client(self):
+        """
+        Web element of last wrapper
+        """
+        return QueryResult(
+            self.__client, self.__scopes[-1], scopes=self.__scopes[:-1],
+        ).first()
+
+    @property
+    def scopes(self):
+        return self.__scopes
+
+    def from_object(self, obj):
+        """
+        Create result from QueryObject instance
+
+        :type obj: QueryObject
+        """
+        if not isinstance(obj, QueryObject):
+            raise TypeError('"{}" is not QueryObject instance'.format(type(obj)))
+
+        return QueryResult(self.__client, compile_object(obj), scopes=self.__scopes)
+
+    def scoped(self, wrapper):
+        """
+        :type wrapper: QueryObject
+        """
+        return self.__class__(
+            self.__client, self.__scopes + (compile_object(wrapper), ),
+        )
+
+    def get_text(self):
+        return self.client.text
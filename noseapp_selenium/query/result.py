@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import time
 import logging
 
 from noseapp.utils.common import waiting_for
@@ -8,41 +9,398 @@ from selenium.common.exceptions import WebDriverException
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.common.exceptions import NoSuchElementException
 
+from noseapp_selenium.tools import polling
+from noseapp_selenium.cache import is_matched
+from noseapp_selenium.diagnostics import LazyMessage
+from noseapp_selenium.diagnostics import format_commands
+from noseapp_selenium.diagnostics import get_html_excerpt
+from noseapp_selenium.tools import execute_script
+from noseapp_selenium.tools import ATTRIBUTE_FUNCTION
+from noseapp_selenium.tools import execute_async_script
+from noseapp_selenium.tools import change_name_from_python_style_to_html
+
 
 logger = logging.getLogger(__name__)
 
 
 DEFAULT_SLEEP = 0.01
 DEFAULT_WAIT_TIMEOUT = 30
+DEFAULT_CHUNK_SIZE = 100
+
+# projections of elements inside browser
+TEXTS = 'texts'
+ATTRS = 'attrs'
+ROWS = 'rows'
+
+# chain of wrappers and query are resolved by one request,
+# name of css is returned if wrapper is not found
+SCOPED_QUERY_SCRIPT = """
+var scopes = arguments[0], css = arguments[1], getAll = arguments[2];
+var root = arguments[3] || document;
+
+for (var i = 0; i < scopes.length; i++) {
+    root = root.querySelector(scopes[i]);
+
+    if (!root) {
+        return scopes[i];
+    }
+}
+
+if (getAll) {
+    return Array.prototype.slice.call(root.querySelectorAll(css));
+}
+
+return root.querySelector(css);
+"""
+
+# count of elements if index is null,
+# else element by index and count of elements
+INDEX_SCRIPT = """
+var scopes = arguments[0], css = arguments[1], index = arguments[2];
+var root = arguments.length > 3 ? arguments[3] : document;
+
+for (var i = 0; i < scopes.length; i++) {
+    root = root.querySelector(scopes[i]);
+
+    if (!root) {
+        return index === null ? 0 : scopes[i];
+    }
+}
+
+var elements = root.querySelectorAll(css);
+
+if (index === null) {
+    return elements.length;
+}
+
+return [elements[index < 0 ? elements.length + index : index] || null, elements.length];
+"""
+
+# slice of elements or their projections and count of elements,
+# all elements are taken if size is null
+SLICE_SCRIPT = ATTRIBUTE_FUNCTION + """
+var scopes = arguments[0], css = arguments[1], start = arguments[2], size = arguments[3];
+var projection = arguments[4], names = arguments[5];
+var root = arguments.length > 6 ? arguments[6] : document;
+
+function text(element) {
+    return (element.innerText === undefined ? element.textContent : element.innerText).trim();
+}
+
+function project(element) {
+    switch (projection) {
+        case 'texts':
+            return text(element);
+        case 'attrs':
+            var values = [];
+
+            for (var i = 0; i < names.length; i++) {
+                values.push(readAttribute(element, names[i]));
+            }
+
+            return values;
+        case 'rows':
+            var cells = element.cells || element.children, row = [];
+
+            for (var j = 0; j < cells.length; j++) {
+                row.push(text(cells[j]));
+            }
+
+            return row;
+        default:
+            return element;
+    }
+}
+
+for (var i = 0; i < scopes.length; i++) {
+    root = root.querySelector(scopes[i]);
+
+    if (!root) {
+        return scopes[i];
+    }
+}
+
+var elements = root.querySelectorAll(css);
+var end = Math.min(size === null ? elements.length : start + size, elements.length);
+var result = [];
+
+for (var k = start; k < end; k++) {
+    result.push(project(elements[k]));
+}
+
+return [result, elements.length];
+"""
+
+# callback is called when element is found or timeout is expired,
+# null is returned if browser does not support MutationObserver
+WAIT_SCRIPT = """
+var scopes = arguments[0], css = arguments[1], timeout = arguments[2];
+var root = arguments.length > 4 ? arguments[3] : document;
+var done = arguments[arguments.length - 1];
+
+function exist() {
+    var node = root;
+
+    for (var i = 0; i < scopes.length; i++) {
+        node = node.querySelector(scopes[i]);
+
+        if (!node) {
+            return false;
+        }
+    }
+
+    return !!node.querySelector(css);
+}
+
+if (exist()) {
+    return done(true);
+}
+
+if (!window.MutationObserver) {
+    return done(null);
+}
+
+var timer;
+var observer = new MutationObserver(function () {
+    if (exist()) {
+        finish(true);
+    }
+});
+
+function finish(result) {
+    observer.disconnect();
+    clearTimeout(timer);
+    done(result);
+}
+
+observer.observe(document, {childList: true, subtree: true, attributes: true});
+timer = setTimeout(function () { finish(exist()); }, timeout);
+"""
 
 
 def _error_handler(e, client, css):
     """
-    To extend error message
+    To extend error message.
+    Extension is rendered when message is used.
     """
-    prefix = u' ' if e.message else u''
+    prefix = u' ' if e.msg else u''
+    wrapped = client.orig() if hasattr(client, 'orig') else client
+    recorder = getattr(getattr(client, 'config', None), 'recorder', None)
+    commands = list(recorder) if recorder else []
 
-    if isinstance(client, WebElement):
-        e.message += u'{}QueryProcessor(From: {}, CSS: {})\n\n--\nSEARCH AREA: {}\n--\n'.format(
-            prefix,
-            repr(client),
-            css,
-            client.get_attribute('innerHTML'),
-        )
+    def render():
+        message = u'{}QueryProcessor(From: {}, CSS: {})'.format(prefix, repr(client), css)
+
+        if isinstance(wrapped, WebElement):
+            message += u'\n\n--\nSEARCH AREA: {}\n--\n'.format(get_html_excerpt(wrapped))
+
+        if commands:
+            message += u'\n\n--\nLAST COMMANDS:\n{}\n--\n'.format(format_commands(commands))
+
+        return message
+
+    e.msg = e.message = LazyMessage(e.msg, render)
+
+
+def _get_implicitly_wait(client):
+    """
+    Implicit wait which is required for next search,
+    it is changed by exist for example
+    """
+    config = client.config
+    value = config.state.required_implicitly_wait
+
+    if value is None:
+        value = config.IMPLICITLY_WAIT
+
+    return value or 0
+
+
+def _get_timeout(client, allow_polling=True):
+    """
+    Timeout of search by script.
+    Implicit wait of browser is emulated always,
+    polling is used if it is not disabled in client.
+    """
+    implicitly_wait = _get_implicitly_wait(client)
+
+    if allow_polling and client.__dict__.get('polling', True):
+        return max(client.config.POLLING_TIMEOUT or 0, implicitly_wait)
+
+    return implicitly_wait
+
+
+def _execute_scoped(client, scopes, css, get_all=False, allow_polling=True):
+    """
+    Execute css query inside chain of wrappers by one request.
+    First element of each wrapper is used as area of search.
+    """
+    config = client.config
+    # search of all elements waits for first one like find_elements with implicit wait
+    t_wait = time.time() + _get_implicitly_wait(client)
+
+    def find():
+        result = execute_script(client, SCOPED_QUERY_SCRIPT, list(scopes), css, bool(get_all))
+
+        if isinstance(result, basestring):
+            raise NoSuchElementException(
+                u'Could not find wrapper with css "{}"'.format(result),
+            )
+
+        if result is None or (get_all and not result and time.time() < t_wait):
+            raise NoSuchElementException(
+                u'Could not find element with css "{}"'.format(css),
+            )
+
+        return result
+
+    timeout = _get_timeout(client, allow_polling=allow_polling)
+
+    if timeout:
+        result = polling(callback=find, timeout=timeout)()
     else:
-        e.message += u'{}QueryProcessor(From: {}, CSS: {})'.format(
-            prefix,
-            repr(client),
-            css,
+        result = find()
+
+    if get_all:
+        return [client.__class__(el, config=config) for el in result]
+
+    element = client.__class__(result, config=config)
+    # stale element will be found by the same chain
+    element.__dict__['locator'] = find
+
+    return element
+
+
+def _make_locator(client, css, index, scopes=()):
+    """
+    Find web element by index again
+    """
+    def locate():
+        result = execute_script(client, INDEX_SCRIPT, list(scopes), css, index)
+
+        if isinstance(result, basestring) or result[0] is None:
+            raise NoSuchElementException(
+                u'Could not find element with css "{}" and index "{}"'.format(css, index),
+            )
+
+        return result[0]
+
+    return locate
+
+
+def _execute_index(client, css, index, scopes=()):
+    """
+    Get web element by index with one request.
+    Other elements are not transferred.
+    """
+    config = client.config
+    # search waits for first element like find_elements with implicit wait
+    t_wait = time.time() + _get_implicitly_wait(client)
+
+    def find():
+        result = execute_script(client, INDEX_SCRIPT, list(scopes), css, index)
+
+        if isinstance(result, basestring):
+            raise NoSuchElementException(
+                u'Could not find wrapper with css "{}"'.format(result),
+            )
+
+        element, length = result
+
+        if not length and time.time() < t_wait:
+            raise NoSuchElementException(
+                u'Could not find element with css "{}"'.format(css),
+            )
+
+        return element
+
+    timeout = _get_timeout(client)
+
+    if timeout:
+        element = polling(callback=find, timeout=timeout)()
+    else:
+        element = find()
+
+    if element is None:
+        return None
+
+    element = client.__class__(element, config=config)
+    # stale element will be found by the same index
+    element.__dict__['locator'] = _make_locator(client, css, index, scopes=scopes)
+
+    return element
+
+
+def _iter_chunks(client, css, chunk_size, scopes=(), projection=None, names=None):
+    """
+    Get elements or their projections by slices of chunk size.
+    Each slice is taken from current state of page.
+    All elements are taken by one slice if chunk size is None.
+    """
+    config = client.config
+    t_wait = time.time() + _get_implicitly_wait(client)
+
+    def fetch(start):
+        result = execute_script(
+            client, SLICE_SCRIPT, list(scopes), css, start, chunk_size, projection, names or [],
         )
 
+        if isinstance(result, basestring):
+            raise NoSuchElementException(
+                u'Could not find wrapper with css "{}"'.format(result),
+            )
 
-def _execute(client, css, get_all=False, allow_polling=True):
+        if not result[1] and not start and time.time() < t_wait:
+            raise NoSuchElementException(
+                u'Could not find element with css "{}"'.format(css),
+            )
+
+        return result
+
+    timeout = _get_timeout(client)
+    start = 0
+
+    while True:
+        if timeout and not start:
+            elements, length = polling(callback=fetch, timeout=timeout)(start)
+        else:
+            elements, length = fetch(start)
+
+        yield elements
+
+        start += len(elements)
+
+        if not elements or start >= length:
+            break
+
+
+def _wait_async(client, css, timeout, scopes=()):
+    """
+    Wait for element inside browser by one request.
+    Result is None if browser can not do it.
+    """
+    result = execute_async_script(
+        client, WAIT_SCRIPT, timeout, list(scopes), css, int(timeout * 1000),
+    )
+
+    return None if result is None else bool(result)
+
+
+def _execute(client, css, get_all=False, allow_polling=True, scopes=None):
     """
     Execute css query
     """
     logger.debug(u'CSS: {} Get all: {}'.format(css, 'Yes' if get_all else 'No'))
 
+    if scopes:
+        try:
+            return _execute_scoped(
+                client, scopes, css, get_all=get_all, allow_polling=allow_polling,
+            )
+        except WebDriverException as e:
+            _error_handler(e, client, u' '.join(scopes + (css, )))
+            raise
+
     css_executors = {
         True: 'find_elements_by_css_selector',
         False: 'find_element_by_css_selector',
@@ -69,9 +427,15 @@ class QueryResult(object):
     Execute actions by css query and returning result
     """
 
-    def __init__(self, client, css):
+    def __init__(self, client, css, scopes=None):
+        """
+        :param client: ProxyObject of web driver or web element
+        :param css: css selector
+        :param scopes: css selectors of wrappers, first match of each is used
+        """
         self._client = client
         self._css = css
+        self._scopes = tuple(scopes or ())
 
     def __getattr__(self, item):
         return getattr(
@@ -86,7 +450,7 @@ class QueryResult(object):
         self._client.config.implicitly_wait(0)
 
         try:
-            el = _execute(self._client, self._css, allow_polling=False)
+            el = _execute(self._client, self._css, allow_polling=False, scopes=self._scopes)
 
             if el:
                 self._client.config.apply_implicitly_wait()
@@ -107,13 +471,38 @@ class QueryResult(object):
 
     def wait(self, timeout=None, sleep=None):
         """
-        Waiting for web element exist
+        Waiting for web element exist.
+
+        If ASYNC_WAIT is enabled in config, browser will wait for element
+        by MutationObserver inside one request, else or if browser does
+        not support it or page was changed while waiting,
+        existence of element will be checked in loop.
         """
+        timeout = timeout or DEFAULT_WAIT_TIMEOUT
+
         try:
+            if self._client.config.ASYNC_WAIT:
+                t_start = time.time()
+
+                try:
+                    result = _wait_async(self._client, self._css, timeout, scopes=self._scopes)
+                except WebDriverException as e:
+                    # page can be changed while waiting,
+                    # rest of timeout is waited for in loop
+                    logger.debug(u'Async waiting is failed: {}'.format(e))
+                    result = None
+
+                if result is not None:
+                    if not result:
+                        raise TimeoutException()
+                    return result
+
+                timeout = max(timeout - (time.time() - t_start), DEFAULT_SLEEP)
+
             return waiting_for(
                 lambda: self.exist,
                 sleep=sleep or DEFAULT_SLEEP,
-                timeout=timeout or DEFAULT_WAIT_TIMEOUT,
+                timeout=timeout,
             )
         except TimeoutException:
             raise TimeoutException(
@@ -122,25 +511,137 @@ class QueryResult(object):
 
     def get(self, index):
         """
-        Get web element by index
+        Get web element by index.
+        Only this element is transferred from browser.
         """
         try:
-            return _execute(self._client, self._css, get_all=True)[index]
-        except IndexError:
+            element = _execute_index(self._client, self._css, index, scopes=self._scopes)
+        except WebDriverException as e:
+            _error_handler(e, self._client, u' '.join(self._scopes + (self._css, )))
+            raise
+
+        if element is None:
             raise NoSuchElementException(
                 'Result does not have element with index "{}". Css: "{}".'.format(
                     index, self._css,
                 ),
             )
 
-    def first(self):
+        return element
+
+    def iter(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Iterate over elements which are got by slices from browser.
+        Elements are wrapped on demand, rows are changed between
+        slices if page is changed.
+
+        :param chunk_size: count of elements in one request
+        """
+        index = 0
+
+        for elements in _iter_chunks(self._client, self._css, chunk_size, scopes=self._scopes):
+            for element in elements:
+                element = self._client.__class__(element, config=self._client.config)
+                element.__dict__['locator'] = _make_locator(
+                    self._client, self._css, index, scopes=self._scopes,
+                )
+                index += 1
+
+                yield element
+
+    def _project(self, projection, chunk_size, names=None, convert=None):
+        chunks = _iter_chunks(
+            self._client,
+            self._css,
+            chunk_size,
+            scopes=self._scopes,
+            projection=projection,
+            names=names,
+        )
+        values = (
+            convert(v) if convert else v
+            for chunk in chunks
+            for v in chunk
+        )
+
+        if chunk_size:
+            return values
+
+        return list(values)
+
+    def texts(self, chunk_size=None):
+        """
+        Texts of elements by one request.
+
+        :param chunk_size: generator of values will be returned,
+          values are got by slices of chunk size
+        """
+        return self._project(TEXTS, chunk_size)
+
+    def attrs(self, *names, **kwargs):
+        """
+        Attributes of elements by one request.
+
+        Example:
+
+            driver.query.a().attrs('href', 'data_id')  # [{'href': ..., 'data_id': ...}]
+
+        :param names: names of attributes in python style
+        :param chunk_size: generator of values will be returned,
+          values are got by slices of chunk size
+        """
+        return self._project(
+            ATTRS,
+            kwargs.get('chunk_size'),
+            names=[change_name_from_python_style_to_html(n) for n in names],
+            convert=lambda values: dict(zip(names, values)),
+        )
+
+    def rows(self, chunk_size=None):
+        """
+        Texts of cells of each row by one request.
+
+        Example:
+
+            driver.query.tr().rows()  # [['cell 1', 'cell 2'], ...]
+
+        :param chunk_size: generator of values will be returned,
+          values are got by slices of chunk size
+        """
+        return self._project(ROWS, chunk_size)
+
+    def count(self):
         """
-        Get first element on page
+        Count of elements at current moment.
+        Elements are counted inside browser.
+        """
+        return execute_script(
+            self._client, INDEX_SCRIPT, list(self._scopes), self._css, None,
+        )
+
+    def first(self, check=False):
         """
-        return _execute(self._client, self._css)
+        Get first element on page.
+        Element will be taken from cache if it is enabled.
+
+        :param check: check by one script that cached element matches query still
+        """
+        cache = self._client.config.element_cache
+
+        if cache is not None:
+            return cache.get(
+                self._client,
+                self._scopes + (self._css, ),
+                lambda: _execute(self._client, self._css, scopes=self._scopes),
+                check=(lambda element: is_matched(
+                    self._client, element, u' '.join(self._scopes + (self._css, )),
+                )) if check else None,
+            )
+
+        return _execute(self._client, self._css, scopes=self._scopes)
 
     def all(self):
         """
         Get all elements of appropriate query
         """
-        return _execute(self._client, self._css, get_all=True)
+        return _execute(self._client, self._css, get_all=True, scopes=self._scopes)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+"""
+State of web driver session for skipping of redundant commands
+"""
+
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CONTENT = 'default_content'
+
+# after these commands found elements belong to another document
+NAVIGATION_COMMANDS = frozenset([
+    'get',
+    'back',
+    'close',
+    'forward',
+    'refresh',
+    'switch_to_frame',
+    'switch_to_window',
+    'switch_to_default_content',
+])
+
+STATE_COMMANDS = NAVIGATION_COMMANDS | frozenset([
+    'implicitly_wait',
+    'set_script_timeout',
+])
+
+
+def get_argument(args, kwargs, name):
+    """
+    Get first argument of method after self
+    """
+    if name in kwargs:
+        return kwargs[name]
+
+    return args[0] if args else None
+
+
+class SessionState(object):
+    """
+    Implicit wait, window and frame which are set in session.
+    None is unknown value.
+
+    Implicit wait affects search of elements only,
+    so it is sent before find_element* command when it was changed.
+    Script timeout is increased for async scripts only.
+    """
+
+    def __init__(self, driver):
+        """
+        :type driver: selenium.webdriver.remote.webdriver.WebDriver
+        """
+        self.__driver = driver
+
+        self.implicitly_wait = None
+        self.required_implicitly_wait = None
+        self.script_timeout = None
+        self.window_handle = None
+        self.frame = None
+
+        # False if async scripts are not supported by browser
+        self.async_scripts = None
+
+    def __repr__(self):
+        return '<SessionState implicitly_wait={} window_handle={} frame={}>'.format(
+            self.implicitly_wait, self.window_handle, self.frame,
+        )
+
+    def require_implicitly_wait(self, value):
+        self.required_implicitly_wait = value
+
+    def sync_implicitly_wait(self):
+        value = self.required_implicitly_wait
+
+        if value is not None and value != self.implicitly_wait:
+            self.__driver.implicitly_wait(value)
+            self.implicitly_wait = value
+
+    def ensure_script_timeout(self, value):
+        """
+        Async script can be executed for value of seconds at least
+        """
+        if self.script_timeout is None or self.script_timeout < value:
+            self.__driver.set_script_timeout(value)
+            self.script_timeout = value
+
+    def is_redundant(self, command, args, kwargs):
+        """
+        Command will not change state of session.
+        Required implicit wait is updated by implicitly_wait command.
+        """
+        if command == 'implicitly_wait':
+            value = get_argument(args, kwargs, 'time_to_wait')
+
+            if value is not None:
+                # explicit value is required for next search
+                # even if command is skipped
+                self.required_implicitly_wait = value
+
+            return value is not None and value == self.implicitly_wait
+
+        if command == 'set_script_timeout':
+            value = get_argument(args, kwargs, 'time_to_wait')
+            return value is not None and value == self.script_timeout
+
+        if command == 'switch_to_window':
+            handle = get_argument(args, kwargs, 'window_name')
+            return (
+                handle is not None
+                and handle == self.window_handle
+                and self.frame == DEFAULT_CONTENT
+            )
+
+        if command == 'switch_to_default_content':
+            return self.frame == DEFAULT_CONTENT
+
+        return False
+
+    def track(self, command, args, kwargs):
+        """
+        Remember state after successful command
+        """
+        if command == 'implicitly_wait':
+            self.implicitly_wait = get_argument(args, kwargs, 'time_to_wait')
+            self.required_implicitly_wait = self.implicitly_wait
+        elif command == 'set_script_timeout':
+            self.script_timeout = get_argument(args, kwargs, 'time_to_wait')
+        elif command == 'switch_to_window':
+            # name of window can be used instead of handle
+            self.window_handle = get_argument(args, kwargs, 'window_name')
+            self.frame = DEFAULT_CONTENT
+        elif command == 'switch_to_default_content':
+            self.frame = DEFAULT_CONTENT
+        elif command == 'close':
+            self.window_handle = None
+            self.frame = None
+        else:
+            self.frame = None
+
+    def invalidate(self):
+        """
+        Window and frame can be changed by command which is not tracked
+        """
+        self.window_handle = None
+        self.frame = None
+
+    def reset(self):
+        """
+        Session is given to another test, support of async scripts is checked again
+        """
+        self.invalidate()
+        self.async_scripts = None
@@ -1,22 +1,180 @@
 # -*- coding: utf8 -*-
 
+import os
+import sys
 import time
+import random
+import logging
+import threading
 from functools import wraps
 
 from noseapp.utils.common import TimeoutException
 from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.common.exceptions import NoSuchFrameException
+from selenium.common.exceptions import NoSuchWindowException
+from selenium.common.exceptions import InvalidSelectorException
+from selenium.common.exceptions import UnexpectedTagNameException
+from selenium.common.exceptions import UnableToSetCookieException
+from selenium.common.exceptions import InvalidCookieDomainException
+from selenium.common.exceptions import MoveTargetOutOfBoundsException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import InvalidSwitchToTargetException
+from selenium.common.exceptions import UnexpectedAlertPresentException
+from selenium.common.exceptions import TimeoutException as ScriptTimeoutException
+
+from noseapp_selenium.metrics import metrics
+from noseapp_selenium.metrics import get_payload_size
+
+
+logger = logging.getLogger(__name__)
+
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+
+
+RETRY = 'retry'
+FAIL_FAST = 'fail_fast'
+RE_RESOLVE = 're_resolve'
+
+# action of polling by class of exception,
+# nearest class from mro of exception will be used
+RETRY_POLICY = {
+    WebDriverException: RETRY,
+    StaleElementReferenceException: RE_RESOLVE,
+    NoSuchFrameException: FAIL_FAST,
+    NoSuchWindowException: FAIL_FAST,
+    InvalidSelectorException: FAIL_FAST,
+    UnexpectedTagNameException: FAIL_FAST,
+    UnableToSetCookieException: FAIL_FAST,
+    InvalidCookieDomainException: FAIL_FAST,
+    InvalidSwitchToTargetException: FAIL_FAST,
+    MoveTargetOutOfBoundsException: FAIL_FAST,
+    UnexpectedAlertPresentException: FAIL_FAST,
+}
+
+DEFAULT_POLLING_SLEEP = 0.01
+DEFAULT_POLLING_MAX_SLEEP = 0.5
+
+# time for delivery of result of async script
+ASYNC_SCRIPT_MARGIN = 5
+
+# parts of error messages when command is not supported by web driver
+UNSUPPORTED_COMMAND_MESSAGES = (
+    'unknown command',
+    'not implemented',
+    'unsupported operation',
+)
+
+# property is used first, then attribute, like get_attribute does
+ATTRIBUTE_FUNCTION = """
+function readAttribute(element, name) {
+    var properties = {'class': 'className', 'for': 'htmlFor', 'readonly': 'readOnly'};
+    var value = element[properties[name] || name];
+
+    if (value === undefined || value === null || typeof value === 'object' || typeof value === 'function') {
+        value = element.getAttribute(name);
+    }
+    if (typeof value === 'boolean') {
+        value = value ? 'true' : null;
+    }
+
+    return value === null || value === undefined ? null : String(value);
+}
+"""
+
+SNAPSHOT_SCRIPT = ATTRIBUTE_FUNCTION + """
+var names = arguments[0], styles = arguments[1], element = arguments[2];
+var result = {attributes: {}, css: {}};
+
+for (var i = 0; i < names.length; i++) {
+    result.attributes[names[i]] = readAttribute(element, names[i]);
+}
+
+if (styles.length) {
+    var computed = window.getComputedStyle(element);
+
+    for (var j = 0; j < styles.length; j++) {
+        result.css[styles[j]] = computed.getPropertyValue(styles[j]);
+    }
+}
+
+return result;
+"""
+
+
+class ElementSnapshot(object):
+    """
+    Immutable values of web element which were got in one request
+    """
+
+    def __init__(self, values, css=None):
+        self.__dict__['__values__'] = values
+        self.__dict__['css'] = css
+
+    def __getattr__(self, item):
+        try:
+            return self.__dict__['__values__'][change_name_from_python_style_to_html(item)]
+        except KeyError:
+            raise AttributeError('Value "{}" was not fetched'.format(item))
+
+    def __setattr__(self, key, value):
+        raise AttributeError('{} is immutable'.format(self.__class__.__name__))
+
+    def __repr__(self):
+        return '<ElementSnapshot {}>'.format(self.__dict__['__values__'])
+
+    def to_dict(self):
+        return dict(self.__dict__['__values__'])
 
 
 class WebElementToObject(object):
 
-    def __init__(self, web_element, allow_raise=True):
+    def __init__(self, web_element, allow_raise=True, client=None):
         self.__dict__['__web_element__'] = web_element
         self.__dict__['__allow_raise__'] = allow_raise
+        self.__dict__['__client__'] = client
 
     @property
     def css(self):
         return WebElementCssToObject(self.__dict__['__web_element__'])
 
+    def fetch(self, *names, **kwargs):
+        """
+        Get attributes and computed styles by one request.
+
+        Example:
+
+            snapshot = element.obj.fetch('value', 'href', css=['color', 'display'])
+            snapshot.value
+            snapshot.css.color
+
+        :param names: names of attributes in python style
+        :param css: names of css properties in python style
+        :rtype: ElementSnapshot
+        """
+        for key in kwargs:
+            if key != 'css':
+                raise TypeError('fetch() got an unexpected keyword argument "{}"'.format(key))
+
+        web_element = self.__dict__['__web_element__']
+        client = self.__dict__['__client__']
+
+        names = [change_name_from_python_style_to_html(n) for n in names]
+        styles = [change_name_from_python_style_to_html(n) for n in kwargs.get('css', [])]
+
+        if client is not None:
+            result = execute_script(client, SNAPSHOT_SCRIPT, names, styles)
+        else:
+            result = web_element.parent.execute_script(
+                SNAPSHOT_SCRIPT, names, styles, web_element,
+            )
+
+        return ElementSnapshot(
+            result['attributes'],
+            css=ElementSnapshot(result['css']),
+        )
+
     def __getattr__(self, item):
         atr = self.__dict__['__web_element__'].get_attribute(
             change_name_from_python_style_to_html(item),
@@ -56,7 +214,7 @@ class WebElementCssToObject(object):
         )
 
 
-def make_object(web_element, allow_raise=True):
+def make_object(web_element, allow_raise=True, client=None):
     """
     Convert web element to object.
 
@@ -67,31 +225,121 @@ def make_object(web_element, allow_raise=True):
         css_value = make_object(input).css.background_image
 
     :type web_element: selenium.webdriver.remote.webdriver.WebElement
+    :param client: ProxyObject of web element, commands are recorded to its config
     """
-    return WebElementToObject(web_element, allow_raise=allow_raise)
+    return WebElementToObject(web_element, allow_raise=allow_raise, client=client)
 
 
-def polling(callback=None, timeout=30, sleep=0.01):
+def get_retry_action(e, policy=None):
+    """
+    Get action of polling for exception
+
+    :param e: instance of exception
+    :param policy: dict of exception class to action
+    """
+    policy = policy or RETRY_POLICY
+
+    for cls in type(e).__mro__:
+        if cls in policy:
+            return policy[cls]
+
+    return FAIL_FAST
+
+
+_retry_stats = {}
+_retry_stats_lock = threading.Lock()
+
+_polling_state = threading.local()
+
+
+def _record_retries(site, retries, failed):
+    with _retry_stats_lock:
+        stats = _retry_stats.setdefault(
+            site, {'calls': 0, 'retries': 0, 'failed': 0},
+        )
+        stats['calls'] += 1
+        stats['retries'] += retries
+        stats['failed'] += int(failed)
+
+
+def get_retry_stats():
+    """
+    Get statistic of polling by call site.
+    Only calls with retries are counted.
+
+    :return: dict of "file:line function" to dict of counters
+    """
+    with _retry_stats_lock:
+        return dict((k, dict(v)) for k, v in _retry_stats.items())
+
+
+def reset_retry_stats():
+    with _retry_stats_lock:
+        _retry_stats.clear()
+
+
+def get_polling_retries():
+    """
+    Count of retries of last polling call in current thread
+    """
+    return getattr(_polling_state, 'retries', 0)
+
+
+def polling(callback=None,
+            timeout=30,
+            sleep=DEFAULT_POLLING_SLEEP,
+            max_sleep=DEFAULT_POLLING_MAX_SLEEP,
+            policy=None,
+            re_resolve=None):
     """
     Do sleep while wrapped function will be raised
     exception of WebDriverException class.
 
+    Action for exception is taken from policy (RETRY_POLICY by default):
+    retry with exponential backoff, fail fast or call re_resolve
+    callback and retry. Without re_resolve callback such exception
+    will be raised at once.
+
     Use timeout param for setting max seconds to waiting.
     This function will be used like decorator if callback is None.
     """
+    backoff = Backoff(base=sleep, max_sleep=max_sleep)
+
     def wrapper(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
-            t_start = time.time()
+            t_end = time.time() + timeout
+            retries = 0
 
-            while time.time() <= t_start + timeout:
+            while True:
                 try:
-                    return f(*args, **kwargs)
-                except WebDriverException:
-                    time.sleep(sleep)
-                    continue
-            else:
-                raise
+                    result = f(*args, **kwargs)
+                except WebDriverException as e:
+                    exc_info = sys.exc_info()
+                    action = get_retry_action(e, policy)
+
+                    if action == RE_RESOLVE and re_resolve is not None:
+                        try:
+                            re_resolve()
+                        except WebDriverException as re_resolve_error:
+                            if get_retry_action(re_resolve_error, policy) != RETRY:
+                                action = FAIL_FAST
+                    elif action != RETRY:
+                        action = FAIL_FAST
+
+                    if action == FAIL_FAST or time.time() >= t_end:
+                        _polling_state.retries = retries
+                        if retries:
+                            _record_retries(_get_call_site(f), retries, True)
+                        raise exc_info[0], exc_info[1], exc_info[2]
+
+                    time.sleep(max(min(backoff(retries), t_end - time.time()), 0))
+                    retries += 1
+                else:
+                    _polling_state.retries = retries
+                    if retries:
+                        _record_retries(_get_call_site(f), retries, False)
+                    return result
 
         return wrapped
 
@@ -101,6 +349,47 @@ def polling(callback=None, timeout=30, sleep=0.01):
     return wrapper
 
 
+def _get_call_site(f):
+    """
+    Get place of calling wrapped function.
+    Frames inside this package are skipped, so calls through
+    QueryResult, proxy and metrics are counted by caller.
+    """
+    frame = sys._getframe(2)
+
+    while frame.f_back is not None and os.path.abspath(
+            frame.f_code.co_filename).startswith(PACKAGE_DIR):
+        frame = frame.f_back
+
+    return '{}:{} {}'.format(
+        frame.f_code.co_filename,
+        frame.f_lineno,
+        getattr(f, '__name__', repr(f)),
+    )
+
+
+class Backoff(object):
+    """
+    Exponential backoff with jitter.
+    Sleep is growing from base to max_sleep,
+    random half of sleep is used for jitter.
+    """
+
+    def __init__(self, base=0.5, factor=2, max_sleep=5):
+        self.base = base
+        self.factor = factor
+        self.max_sleep = max_sleep
+
+    def __call__(self, attempt):
+        """
+        Get sleep for attempt
+
+        :param attempt: number of attempt from 0
+        """
+        sleep = min(self.max_sleep, self.base * self.factor ** attempt)
+        return sleep / 2.0 + random.uniform(0, sleep / 2.0)
+
+
 class ReRaiseWebDriverException(BaseException):
     pass
 
@@ -141,15 +430,14 @@ def re_raise_wd_exc(callback=None, exc_cls=ReRaiseWebDriverException, message=No
 def get_query_from_driver(driver, wrapper=None):
     """
     Return QueryProcessor instance from driver.
-    If wrapper is not None, at wrapper will be merged.
+    If wrapper is not None, at wrapper will be merged
+    and it will be resolved with query by one request.
 
     :param driver: ProxyObject
     :param wrapper: QueryObject
     """
     if wrapper:
-        return driver.query.from_object(
-            wrapper,
-        ).first().query
+        return driver.query.scoped(wrapper)
 
     return driver.query
 
@@ -191,3 +479,98 @@ def change_name_from_python_style_to_html(name):
     if name.startswith('-'):
         return name[1::]
     return name
+
+
+def _call_script(client, driver, command, script, args):
+    """
+    Call script command of web driver.
+    Command is recorded to config and to metrics like commands of proxy.
+    """
+    client.config.record(command, args)
+
+    if not metrics.enabled:
+        return getattr(driver, command)(script, *args)
+
+    t_start = time.time()
+    error = False
+
+    try:
+        return getattr(driver, command)(script, *args)
+    except BaseException:
+        error = True
+        raise
+    finally:
+        metrics.record(
+            command,
+            time.time() - t_start,
+            session=driver.session_id,
+            payload=get_payload_size((script, ) + args, {}),
+            error=error,
+        )
+
+
+def execute_script(client, script, *args):
+    """
+    Execute script from web driver or web element.
+    Web element of client is passed as last argument.
+
+    :param client: ProxyObject of web driver or web element
+    """
+    wrapped = client.orig()
+
+    if isinstance(wrapped, WebElement):
+        driver, args = wrapped.parent, args + (wrapped, )
+    else:
+        driver = wrapped
+
+    return _call_script(client, driver, 'execute_script', script, args)
+
+
+def is_unsupported(e):
+    """
+    Command is not implemented by web driver
+    """
+    message = (e.msg or u'').lower()
+
+    return any(m in message for m in UNSUPPORTED_COMMAND_MESSAGES)
+
+
+def execute_async_script(client, script, timeout, *args):
+    """
+    Execute async script which is waiting inside browser.
+    Web element of client is passed as last argument before callback.
+
+    Result is None if browser can not execute async scripts or
+    script returned null, async scripts will not be used for session then.
+    Other errors of web driver are raised as is.
+
+    :param client: ProxyObject of web driver or web element
+    :param timeout: seconds of waiting inside browser
+    :raises: TimeoutException
+    """
+    wrapped = client.orig()
+    state = client.config.state
+
+    if state.async_scripts is False:
+        return None
+
+    if isinstance(wrapped, WebElement):
+        driver, args = wrapped.parent, args + (wrapped, )
+    else:
+        driver = wrapped
+
+    try:
+        state.ensure_script_timeout(timeout + ASYNC_SCRIPT_MARGIN)
+        result = _call_script(client, driver, 'execute_async_script', script, args)
+    except ScriptTimeoutException as e:
+        raise TimeoutException(e.msg)
+    except WebDriverException as e:
+        if not is_unsupported(e):
+            raise
+        logger.debug(u'Async script is not supported: {}'.format(e))
+        result = None
+
+    if result is None:
+        state.async_scripts = False
+
+    return result